@@ -0,0 +1,159 @@
+import datetime
+import math
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Max, Min, StdDev, Sum, Value, When
+from django.db.models.functions import Cast, TruncMonth
+from rest_framework.exceptions import ValidationError
+
+
+def _years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        # February 29th
+        return day.replace(year=day.year - years, day=28)
+
+
+def age_band_expression(today=None):
+    """
+    Age band label of the assessment's patient, computed in SQL from date_of_birth and the
+    ASSESSMENT_AGE_BANDS lower bounds, e.g. 0-17, 18-29, ..., 75+ and "unknown" without a birth date
+    """
+    today = today or datetime.date.today()
+    bounds = [0, *settings.ASSESSMENT_AGE_BANDS]
+    whens = [
+        When(patient__date_of_birth__gt=_years_before(today, upper), then=Value(f'{lower}-{upper - 1}'))
+        for lower, upper in zip(bounds, bounds[1:])
+    ]
+    whens.append(When(patient__date_of_birth__isnull=False, then=Value(f'{bounds[-1]}+')))
+    return Case(*whens, default=Value('unknown'))
+
+
+DIMENSIONS = {
+    'assessment_type': lambda: F('assessment_type'),
+    'month': lambda: TruncMonth('assessment_date'),
+    'age_band': age_band_expression,
+}
+
+
+def parse_dimensions(value):
+    dimensions = list(dict.fromkeys(name.strip() for name in (value or 'assessment_type').split(',') if name.strip()))
+    unknown = [name for name in dimensions if name not in DIMENSIONS]
+    if unknown or not dimensions:
+        raise ValidationError({'group_by': f'Expected a comma separated list of {", ".join(DIMENSIONS)}'})
+    return dimensions
+
+
+def _group_value(value):
+    return value.strftime('%Y-%m') if isinstance(value, datetime.date) else value
+
+
+def _stream_scores(queryset, total):
+    """
+    The score column of queryset in one float64 array, read with a server side cursor on
+    PostgreSQL and without Django's per row conversion, the scores already are floats
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.values_list('score').query.sql_with_params()
+    scores = np.empty(total, dtype=np.float64)
+    position = 0
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while chunk := cursor.fetchmany(settings.ANALYTICS_CHUNK_SIZE):
+            if position + len(chunk) > total:
+                break
+            scores[position:position + len(chunk)] = np.fromiter(chain.from_iterable(chunk), dtype=np.float64, count=len(chunk))
+            position += len(chunk)
+    if position != total:
+        raise RuntimeError('Assessments changed while their scores were read, retry the request')
+    return scores
+
+
+def score_statistics(queryset, dimensions, percentiles, bins):
+    """
+    final_score statistics of the assessments in queryset grouped by dimensions.
+
+    count, mean, standard deviation, min and max are SQL aggregates of one GROUP BY query. The
+    scores are then streamed in the same group order, cast to float in SQL, into one NumPy array
+    that the group counts split for the percentiles and histograms. Both queries read the same
+    snapshot (REPEATABLE READ on PostgreSQL, unless called inside a transaction). Histograms
+    share bin edges spanning the overall min and max so groups can be compared.
+    """
+    queryset = queryset.filter(final_score__isnull=False).annotate(
+        score=Cast('final_score', FloatField()),
+        **{name: DIMENSIONS[name]() for name in dimensions if name != 'assessment_type'},
+    ).order_by(*dimensions)
+    connection = connections[queryset.db]
+    # SET TRANSACTION must be the first statement of the transaction, nested in the transaction
+    # of a caller the queries read at the isolation level the caller chose
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using=queryset.db):
+        if connection.vendor == 'postgresql' and outermost:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        groups = list(queryset.values(*dimensions).annotate(
+            count=Count('score'), mean=Avg('score'), stddev=StdDev('score'), min=Min('score'), max=Max('score'),
+        ))
+        if not groups:
+            return [], []
+        counts = [group['count'] for group in groups]
+        scores = _stream_scores(queryset, sum(counts))
+
+    low = min(group['min'] for group in groups)
+    high = max(group['max'] for group in groups)
+    edges = np.histogram_bin_edges(scores[:0], bins=bins, range=(low, high) if high > low else (low - 0.5, low + 0.5))
+    results = []
+    for group, group_scores in zip(groups, np.split(scores, np.cumsum(counts)[:-1])):
+        histogram, _edges = np.histogram(group_scores, bins=edges)
+        results.append({
+            **{name: _group_value(group[name]) for name in dimensions},
+            'count': group['count'],
+            'mean': group['mean'],
+            'stddev': group['stddev'],
+            'min': group['min'],
+            'max': group['max'],
+            'percentiles': dict(zip((f'p{p:g}' for p in percentiles), np.percentile(group_scores, percentiles).tolist())),
+            'histogram': histogram.tolist(),
+        })
+    return results, edges.tolist()
+
+
+ROLLUP_PERIODS = {
+    'day': lambda: F('assessment_date'),
+    'month': lambda: TruncMonth('assessment_date'),
+}
+
+
+def rollup_statistics(queryset, period):
+    """
+    count, mean, standard deviation, min and max of final_score per assessment type and day or
+    month, read from the daily rollups (patient.rollups) in one GROUP BY query. The cost depends
+    on the number of days covered, not on the number of assessments.
+    """
+    if period not in ROLLUP_PERIODS:
+        raise ValidationError({'period': f'Expected one of {", ".join(ROLLUP_PERIODS)}'})
+    groups = queryset.annotate(period=ROLLUP_PERIODS[period]()).values('assessment_type', 'period').annotate(
+        total=Sum('count'), score_total=Sum('score_sum'), squares_total=Sum('score_sum_squares'),
+        lowest=Min('score_min'), highest=Max('score_max'),
+    ).order_by('assessment_type', 'period')
+    results = []
+    for group in groups:
+        count = group['total']
+        mean = float(group['score_total']) / count
+        # Population standard deviation like StdDev(), clamped against rounding below 0
+        variance = max(float(group['squares_total']) / count - mean * mean, 0.0)
+        day = group['period']
+        results.append({
+            'assessment_type': group['assessment_type'] or None,
+            period: day.strftime('%Y-%m') if period == 'month' else day.isoformat(),
+            'count': count,
+            'mean': mean,
+            'stddev': math.sqrt(variance),
+            'min': float(group['lowest']),
+            'max': float(group['highest']),
+        })
+    return results
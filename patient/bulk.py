@@ -0,0 +1,80 @@
+from django.db import transaction
+
+from patient.models import Assessment, PatientDetail
+from patient.rollups import add_to_rollups
+from patient.serializers import AssessmentBulkItemSerializer, PatientBulkItemSerializer
+
+
+def _validate_items(items, item_serializer_class):
+    """
+    Run field validation for every item, returns ({index: validated_data}, {index: errors})
+    """
+    valid, errors = {}, {}
+    for index, item in enumerate(items):
+        serializer = item_serializer_class(data=item)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+    return valid, errors
+
+
+def _insert(model, valid, batch_size, after_insert=None):
+    """
+    Insert the validated rows with bulk_create in chunks of batch_size inside one transaction,
+    after_insert(objs) runs in the same transaction
+    """
+    indexes = list(valid)
+    objs = [model(**valid[index]) for index in indexes]
+    with transaction.atomic():
+        objs = model.objects.bulk_create(objs, batch_size=batch_size)
+        if after_insert is not None:
+            after_insert(objs)
+    return [{"index": index, "id": obj.pk} for index, obj in zip(indexes, objs)]
+
+
+def _format_errors(errors):
+    return [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+
+
+def bulk_create_patients(items, batch_size):
+    """
+    Validate and insert a list of patients, existing phone numbers are fetched with one IN query.
+    Returns (created, errors) where both are lists of per-item dicts keyed by the item index.
+    """
+    valid, errors = _validate_items(items, PatientBulkItemSerializer)
+
+    # Only NULL may repeat under the unique constraint, "" is an ordinary value
+    phone_numbers = {data["phone_number"] for data in valid.values() if data.get("phone_number") is not None}
+    taken = set(PatientDetail.objects.filter(phone_number__in=phone_numbers).values_list("phone_number", flat=True))
+    for index in list(valid):
+        phone_number = valid[index].get("phone_number")
+        if phone_number is None:
+            continue
+        if phone_number in taken:
+            errors[index] = {"phone_number": ["Patient with this phone number already exists."]}
+            del valid[index]
+        else:
+            # Later duplicates inside the same batch are rejected as well
+            taken.add(phone_number)
+
+    return _insert(PatientDetail, valid, batch_size), _format_errors(errors)
+
+
+def bulk_create_assessments(items, batch_size):
+    """
+    Validate and insert a list of assessments, referenced patients are fetched with one IN query.
+    Returns (created, errors) where both are lists of per-item dicts keyed by the item index.
+    """
+    valid, errors = _validate_items(items, AssessmentBulkItemSerializer)
+
+    patient_ids = {data["patient_id"] for data in valid.values()}
+    existing = set(PatientDetail.objects.filter(id__in=patient_ids).values_list("id", flat=True))
+    for index in list(valid):
+        patient_id = valid[index]["patient_id"]
+        if patient_id not in existing:
+            errors[index] = {"patient_id": [f'Invalid pk "{patient_id}" - object does not exist.']}
+            del valid[index]
+
+    # bulk_create skips the signals maintaining the daily rollups
+    return _insert(Assessment, valid, batch_size, after_insert=add_to_rollups), _format_errors(errors)
@@ -0,0 +1,118 @@
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+
+def filter_patients(queryset, query_params):
+    """
+    Apply the patient list query params (full_name, phone_number, q) to a queryset.
+
+    The substring filters are icontains lookups, on PostgreSQL they are answered by the
+    UPPER(...) gin_trgm_ops indexes created in migration 0003 instead of a sequential scan.
+    """
+    full_name = query_params.get('full_name', None)
+    phone_number = query_params.get('phone_number', None)
+    q = Q()
+    if full_name:
+        q &= Q(full_name__icontains=full_name)
+    if phone_number:
+        q &= Q(phone_number__icontains=phone_number)
+    queryset = queryset.filter(q)
+
+    search = query_params.get('q', None)
+    if search:
+        queryset = search_patients(queryset, search)
+    return queryset
+
+
+def search_patients(queryset, term):
+    """
+    Ranked search over full_name and phone_number.
+
+    On PostgreSQL matches are ordered by trigram similarity, other backends (SQLite in tests)
+    return the same matches in the default newest first order.
+    """
+    queryset = queryset.filter(Q(full_name__icontains=term) | Q(phone_number__icontains=term))
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset
+    return queryset.annotate(
+        rank=Greatest(TrigramSimilarity('full_name', term), TrigramSimilarity('phone_number', term))
+    ).order_by('-rank', '-created_date', '-id')
+
+
+def _parse_param(query_params, name, parser):
+    value = query_params.get(name, None)
+    if not value:
+        return None
+    try:
+        parsed = parser(value)
+    except (ValueError, TypeError, InvalidOperation):
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: f'Invalid value {value!r}'})
+    return parsed
+
+
+def filter_assessments(queryset, query_params):
+    """
+    Apply the assessment list query params to a queryset.
+
+    assessment_type (exact), assessment_date or the date_from/date_to range, patient_id and the
+    min_score/max_score range. Filters by patient or type with a date range are range scans on the
+    (patient, assessment_date) and (assessment_type, assessment_date) indexes.
+    """
+    assessment_type = query_params.get('assessment_type', None)
+    assessment_date = _parse_param(query_params, 'assessment_date', parse_date)
+    date_from = _parse_param(query_params, 'date_from', parse_date)
+    date_to = _parse_param(query_params, 'date_to', parse_date)
+    patient_id = _parse_param(query_params, 'patient_id', int)
+    min_score = _parse_param(query_params, 'min_score', Decimal)
+    max_score = _parse_param(query_params, 'max_score', Decimal)
+
+    q = Q()
+    if assessment_type:
+        q &= Q(assessment_type=assessment_type)
+    if patient_id is not None:
+        q &= Q(patient_id=patient_id)
+    if assessment_date:
+        q &= Q(assessment_date=assessment_date)
+    if date_from:
+        q &= Q(assessment_date__gte=date_from)
+    if date_to:
+        q &= Q(assessment_date__lte=date_to)
+    if min_score is not None:
+        q &= Q(final_score__gte=min_score)
+    if max_score is not None:
+        q &= Q(final_score__lte=max_score)
+    return queryset.filter(q)
+
+
+def filter_rollups(queryset, query_params):
+    """
+    Apply the assessment_type, assessment_date and date_from/date_to assessment filters to the
+    daily rollups. Rollups do not keep patients nor single scores, patient_id and the score range
+    are rejected rather than ignored.
+    """
+    unsupported = [name for name in ('patient_id', 'min_score', 'max_score') if query_params.get(name, None)]
+    if unsupported:
+        raise ValidationError({name: 'Not available on the daily rollups' for name in unsupported})
+    assessment_type = query_params.get('assessment_type', None)
+    assessment_date = _parse_param(query_params, 'assessment_date', parse_date)
+    date_from = _parse_param(query_params, 'date_from', parse_date)
+    date_to = _parse_param(query_params, 'date_to', parse_date)
+
+    q = Q()
+    if assessment_type:
+        q &= Q(assessment_type=assessment_type)
+    if assessment_date:
+        q &= Q(assessment_date=assessment_date)
+    if date_from:
+        q &= Q(assessment_date__gte=date_from)
+    if date_to:
+        q &= Q(assessment_date__lte=date_to)
+    return queryset.filter(q)
@@ -0,0 +1,381 @@
+import abc
+import csv
+import io
+import json
+import os
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, models, transaction
+from django.utils.dateparse import parse_date
+
+from patient.models import Assessment, PatientDetail
+from patient.rollups import add_to_rollups, rollup_upsert_sql
+from utils.cache import response_cache
+
+
+def read_records(path, file_format=None):
+    """
+    Stream records from a CSV (with header row) or NDJSON file, one at a time.
+    CSV records are dicts, NDJSON records are the raw lines, decoded by RecordImporter.clean
+    """
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, newline='', encoding='utf-8') as fp:
+        if file_format == 'csv':
+            yield from csv.DictReader(fp)
+        elif file_format in ('ndjson', 'jsonl'):
+            for line in fp:
+                line = line.strip()
+                if line:
+                    yield line
+        else:
+            raise ValueError(f'Unsupported file format {file_format!r}, use csv or ndjson')
+
+
+class IteratorFile(io.TextIOBase):
+    """
+    Read only file object over an iterator of strings, lets COPY FROM STDIN consume a generator
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+        if size is None or size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class RecordImporter(abc.ABC):
+    """
+    Bulk loader for one model.
+
+    On PostgreSQL the cleaned records are streamed with COPY FROM STDIN into a temporary staging
+    table and merged into the real table with a single INSERT ... SELECT. Other backends fall back
+    to chunked bulk_create. Subclasses describe the columns and the merge.
+    """
+    model = None
+    columns = ()
+    staging_table = None
+
+    def __init__(self, database='default', chunk_size=5000, max_errors=20):
+        self.database = database
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.read = 0
+        self.skipped = 0
+        self.errors = []
+
+    def field(self, name):
+        return self.model._meta.get_field(name)
+
+    def convert(self, name, value):
+        field = self.field(name)
+        if isinstance(field, models.JSONField):
+            value = json.loads(value) if isinstance(value, str) else value
+            if not isinstance(value, dict):
+                raise ValueError('must be a JSON object')
+            return value
+        if isinstance(field, models.DateField):
+            parsed = value if isinstance(value, date) else parse_date(str(value))
+            if parsed is None:
+                raise ValueError('must be a YYYY-MM-DD date')
+            return parsed
+        if isinstance(field, models.DecimalField):
+            number = Decimal(str(value))
+            if not number.is_finite() or abs(number) >= Decimal(10) ** (field.max_digits - field.decimal_places):
+                raise ValueError(f'must fit in {field.max_digits} digits')
+            return number.quantize(Decimal(1).scaleb(-field.decimal_places))
+        if isinstance(field, models.ForeignKey):
+            return int(value)
+        value = str(value)
+        if field.max_length and len(value) > field.max_length:
+            raise ValueError(f'must be at most {field.max_length} characters')
+        return value
+
+    def clean(self, record):
+        if isinstance(record, str):
+            record = json.loads(record)
+            if not isinstance(record, dict):
+                raise ValueError('must be a JSON object')
+        row = {}
+        for name in self.columns:
+            value = record.get(name)
+            row[name] = None if value is None or value == '' else self.convert(name, value)
+        return row
+
+    def cleaned_rows(self, records):
+        for line, record in enumerate(records, start=1):
+            self.read += 1
+            try:
+                yield line, self.clean(record)
+            except (ValueError, TypeError, InvalidOperation) as e:
+                self.skipped += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append(f'record {line}: {e}')
+
+    def run(self, records):
+        """
+        Import the records, returns a dict with read/inserted/updated/skipped counts
+        """
+        rows = self.cleaned_rows(records)
+        with transaction.atomic(using=self.database):
+            if connections[self.database].vendor == 'postgresql':
+                inserted, updated = self.copy_and_merge(rows)
+            else:
+                inserted, updated = self.bulk_insert(rows)
+        # COPY and bulk_create bypass the model signals
+        response_cache.bump(self.model)
+        return {
+            'read': self.read,
+            'inserted': inserted,
+            'updated': updated,
+            'skipped': self.skipped,
+        }
+
+    # PostgreSQL COPY path
+
+    @abc.abstractmethod
+    def staging_columns(self):
+        """
+        (name, type) of the staging table columns, the line number first
+        """
+
+    def pre_merge_sql(self):
+        """
+        Statements run on the filled staging table before the merge
+        """
+        return []
+
+    @abc.abstractmethod
+    def merge_sql(self):
+        """
+        SQL moving the staging rows into the model table, returning one (inserted, updated) row
+        """
+
+    def copy_value(self, value):
+        if isinstance(value, dict):
+            return json.dumps(value)
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+
+    def csv_chunks(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for count, (line, row) in enumerate(rows, start=1):
+            writer.writerow([line] + [self.copy_value(row[name]) for name in self.columns])
+            if count % self.chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def copy_and_merge(self, rows):
+        columns = ', '.join(name for name, _type in self.staging_columns())
+        definition = ', '.join(f'{name} {column_type}' for name, column_type in self.staging_columns())
+        copy_sql = f'COPY {self.staging_table} ({columns}) FROM STDIN WITH (FORMAT csv)'
+        with connections[self.database].cursor() as cursor:
+            cursor.execute(f'CREATE TEMPORARY TABLE {self.staging_table} ({definition}) ON COMMIT DROP')
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy_expert'):
+                # psycopg2
+                raw_cursor.copy_expert(copy_sql, IteratorFile(self.csv_chunks(rows)), size=65536)
+            else:
+                # psycopg 3
+                with raw_cursor.copy(copy_sql) as copy:
+                    for chunk in self.csv_chunks(rows):
+                        copy.write(chunk)
+            for sql in self.pre_merge_sql():
+                cursor.execute(sql)
+            cursor.execute(self.merge_sql())
+            inserted, updated = cursor.fetchone()
+        self.skipped += self.read - self.skipped - inserted - updated
+        return inserted, updated
+
+    # Fallback path for other backends
+
+    def chunks(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @abc.abstractmethod
+    def bulk_insert(self, rows):
+        """
+        Insert the cleaned (line, row) pairs with bulk_create, returns (inserted, updated)
+        """
+
+
+class PatientImporter(RecordImporter):
+    """
+    Loads patients, rows with a phone number already in the table update that patient (last row wins)
+    """
+    model = PatientDetail
+    columns = ('full_name', 'gender', 'phone_number', 'date_of_birth', 'address', 'extras')
+    staging_table = 'patient_import'
+    update_fields = ['full_name', 'gender', 'date_of_birth', 'address', 'extras', 'updated_date']
+
+    def staging_columns(self):
+        return [
+            ('line', 'bigint'),
+            ('full_name', 'varchar(100)'),
+            ('gender', 'varchar(100)'),
+            ('phone_number', 'varchar(100)'),
+            ('date_of_birth', 'date'),
+            ('address', 'varchar(100)'),
+            ('extras', 'jsonb'),
+        ]
+
+    def merge_sql(self):
+        return f"""
+            WITH deduplicated AS (
+                SELECT DISTINCT ON (phone_number) * FROM {self.staging_table}
+                WHERE phone_number IS NOT NULL ORDER BY phone_number, line DESC
+            ),
+            merged AS (
+                INSERT INTO patient (full_name, gender, phone_number, date_of_birth, address, extras, created_date, updated_date)
+                SELECT full_name, gender, phone_number, date_of_birth, address, COALESCE(extras, '{{}}'), now(), now()
+                FROM deduplicated
+                UNION ALL
+                SELECT full_name, gender, phone_number, date_of_birth, address, COALESCE(extras, '{{}}'), now(), now()
+                FROM {self.staging_table} WHERE phone_number IS NULL
+                ON CONFLICT (phone_number) DO UPDATE SET
+                    full_name = EXCLUDED.full_name,
+                    gender = EXCLUDED.gender,
+                    date_of_birth = EXCLUDED.date_of_birth,
+                    address = EXCLUDED.address,
+                    extras = EXCLUDED.extras,
+                    updated_date = EXCLUDED.updated_date
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+        """
+
+    def bulk_insert(self, rows):
+        inserted = updated = 0
+        for chunk in self.chunks(rows):
+            by_phone, without_phone = {}, []
+            for _line, row in chunk:
+                if row['extras'] is None:
+                    row['extras'] = {}
+                if row['phone_number']:
+                    by_phone[row['phone_number']] = row
+                else:
+                    without_phone.append(row)
+            existing = set(PatientDetail.objects.using(self.database).filter(
+                phone_number__in=list(by_phone)).values_list('phone_number', flat=True))
+            objs = [PatientDetail(**row) for row in list(by_phone.values()) + without_phone]
+            PatientDetail.objects.using(self.database).bulk_create(
+                objs, update_conflicts=True, unique_fields=['phone_number'], update_fields=self.update_fields)
+            updated += len(existing)
+            inserted += len(objs) - len(existing)
+            self.skipped += len(chunk) - len(objs)
+        return inserted, updated
+
+
+class AssessmentImporter(RecordImporter):
+    """
+    Loads assessments, the patient is referenced by patient_id or patient_phone_number.
+    Rows whose patient does not exist are skipped.
+    """
+    model = Assessment
+    columns = ('patient_id', 'patient_phone_number', 'assessment_type', 'assessment_date', 'questions_answers',
+               'final_score', 'extras')
+    staging_table = 'assessment_import'
+
+    def field(self, name):
+        if name == 'patient_id':
+            return self.model._meta.get_field('patient')
+        if name == 'patient_phone_number':
+            return PatientDetail._meta.get_field('phone_number')
+        return super().field(name)
+
+    def staging_columns(self):
+        return [
+            ('line', 'bigint'),
+            ('patient_id', 'bigint'),
+            ('patient_phone_number', 'varchar(100)'),
+            ('assessment_type', 'varchar(100)'),
+            ('assessment_date', 'date'),
+            ('questions_answers', 'varchar(100)'),
+            ('final_score', 'numeric(10, 2)'),
+            ('extras', 'jsonb'),
+        ]
+
+    def pre_merge_sql(self):
+        # Resolve patients referenced by phone number with one join on the unique phone_number index
+        return [f"""
+            UPDATE {self.staging_table} s SET patient_id = p.id FROM patient p
+            WHERE s.patient_id IS NULL AND p.phone_number = s.patient_phone_number
+        """]
+
+    def merge_sql(self):
+        return f"""
+            WITH merged AS (
+                INSERT INTO assessment (patient_id, assessment_type, assessment_date, questions_answers, final_score, extras,
+                                        created_date, updated_date)
+                SELECT p.id, s.assessment_type, s.assessment_date, s.questions_answers, s.final_score, COALESCE(s.extras, '{{}}'),
+                       now(), now()
+                FROM {self.staging_table} s JOIN patient p ON p.id = s.patient_id
+                RETURNING 1
+            )
+            SELECT count(*), 0 FROM merged
+        """
+
+    def copy_and_merge(self, rows):
+        inserted, updated = super().copy_and_merge(rows)
+        # COPY skips the signals maintaining the daily rollups, add the imported rows to them
+        with connections[self.database].cursor() as cursor:
+            cursor.execute(rollup_upsert_sql(f"""
+                SELECT COALESCE(s.assessment_type, ''), s.assessment_date, count(*), sum(s.final_score),
+                       sum(s.final_score * s.final_score), min(s.final_score), max(s.final_score)
+                FROM {self.staging_table} s JOIN patient p ON p.id = s.patient_id
+                WHERE s.assessment_date IS NOT NULL AND s.final_score IS NOT NULL
+                GROUP BY 1, 2
+            """))
+        return inserted, updated
+
+    def bulk_insert(self, rows):
+        inserted = 0
+        for chunk in self.chunks(rows):
+            chunk = [row for _line, row in chunk]
+            ids = {row['patient_id'] for row in chunk if row['patient_id'] is not None}
+            phone_numbers = {row['patient_phone_number'] for row in chunk if row['patient_id'] is None and row['patient_phone_number']}
+            existing = set(PatientDetail.objects.using(self.database).filter(id__in=ids).values_list('id', flat=True))
+            by_phone = dict(PatientDetail.objects.using(self.database).filter(
+                phone_number__in=phone_numbers).values_list('phone_number', 'id'))
+            objs = []
+            for row in chunk:
+                patient_id = row.pop('patient_id')
+                phone_number = row.pop('patient_phone_number')
+                if patient_id is None:
+                    patient_id = by_phone.get(phone_number)
+                elif patient_id not in existing:
+                    patient_id = None
+                if patient_id is None:
+                    continue
+                if row['extras'] is None:
+                    row['extras'] = {}
+                objs.append(Assessment(patient_id=patient_id, **row))
+            Assessment.objects.using(self.database).bulk_create(objs)
+            add_to_rollups(objs, using=self.database)
+            inserted += len(objs)
+            self.skipped += len(chunk) - len(objs)
+        return inserted, 0
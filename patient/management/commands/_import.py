@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from patient.importers import read_records
+
+
+class ImportCommand(BaseCommand):
+    """
+    Shared options and reporting of the import_* commands
+    """
+    importer_class = None
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row or NDJSON file")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="File format, detected from the extension by default")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per COPY write or bulk_create batch")
+        parser.add_argument("--database", default="default", help="Database alias to load into")
+
+    def handle(self, *args, **options):
+        importer = self.importer_class(database=options["database"], chunk_size=options["chunk_size"])
+        start = time.perf_counter()
+        try:
+            result = importer.run(read_records(options["path"], options["format"]))
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+        elapsed = time.perf_counter() - start
+
+        for error in importer.errors:
+            self.stderr.write(f"Skipped {error}")
+        rate = result["read"] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {result['read']} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec): "
+            f"{result['inserted']} inserted, {result['updated']} updated, {result['skipped']} skipped"
+        ))
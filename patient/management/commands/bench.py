@@ -0,0 +1,428 @@
+import datetime
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+
+from patient.models import Assessment, PatientDetail
+from patient.rollups import add_to_rollups, assessment_rollup_keys, refresh_rollups
+from registered_users.models import RegisteredUser
+from utils.cache import response_cache
+
+# Seeded patients and users are recognized by this prefix and removed after the run
+BENCH_PREFIX = "bench-"
+BENCH_EMAIL = "bench-user@example.com"
+BENCH_PASSWORD = "Tr0ub4dor&3-horse"
+SEED_BATCH_SIZE = 2000
+ASSESSMENT_TYPES = ("PHQ-9", "GAD-7", "PCL-5")
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+# Weighted request mix used without --mix, the same JSON lines format (see Command)
+SYNTHETIC_MIX = [
+    {"name": "patient list", "method": "GET", "path": "/api/v1/patient/", "weight": 25},
+    {"name": "patient search", "method": "GET", "path": "/api/v1/patient/?q=Bench", "weight": 5},
+    {"name": "patient timeline", "method": "GET", "path": "/api/v1/patient/{patient_id}/timeline/", "weight": 8},
+    {"name": "patient create", "method": "POST", "path": "/api/v1/patient/", "weight": 4, "body": {
+        "full_name": "Bench Patient {unique}", "gender": "F", "phone_number": BENCH_PREFIX + "{unique}",
+        "date_of_birth": "1990-01-01", "address": "Kathmandu"}},
+    {"name": "patient update", "method": "PATCH", "path": "/api/v1/patient/{patient_id}/", "weight": 3, "body": {"address": "Lalitpur"}},
+    {"name": "assessment list", "method": "GET", "path": "/api/v1/assessment/?patient_id={patient_id}", "weight": 15},
+    {"name": "assessment range", "method": "GET", "path": "/api/v1/assessment/?assessment_type=PHQ-9&date_from=2024-01-01&date_to=2024-03-31",
+     "weight": 10},
+    {"name": "assessment create", "method": "POST", "path": "/api/v1/assessment/", "weight": 8, "body": {
+        "patient_id": "{patient_id}", "assessment_type": "PHQ-9", "assessment_date": "{today}",
+        "questions_answers": "1,2,3", "final_score": "12.00"}},
+    {"name": "register", "method": "POST", "path": "/api/v1/register/", "weight": 1, "auth": False, "body": {
+        "email": BENCH_PREFIX + "{unique}@example.com", "password": BENCH_PASSWORD, "full_name": "Bench User"}},
+    {"name": "token", "method": "POST", "path": "/api/token/", "weight": 1, "auth": False, "body": {
+        "email": BENCH_EMAIL, "password": BENCH_PASSWORD}},
+]
+
+
+def fill(value, context):
+    """
+    Replace the {placeholders} of a request path or body, a string that is only a placeholder takes the value's type
+    """
+    if isinstance(value, str):
+        match = PLACEHOLDER.fullmatch(value)
+        if match:
+            return context[match.group(1)]
+        return PLACEHOLDER.sub(lambda m: str(context[m.group(1)]), value)
+    if isinstance(value, dict):
+        return {key: fill(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, context) for item in value]
+    return value
+
+
+def latency_summary(latencies):
+    latencies = np.asarray(latencies) * 1000
+    p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99]).tolist()
+    return {"mean": float(latencies.mean()), "p50": p50, "p90": p90, "p95": p95, "p99": p99, "max": float(latencies.max())}
+
+
+class InProcessClient:
+    """
+    Requests through the full middleware stack in this process, no server needed
+    """
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def send(self, method, path, body, headers):
+        data = json.dumps(body) if body is not None else ""
+        response = self.client.generic(method, path, data=data, content_type="application/json", headers=headers)
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, response.headers.get("Server-Timing"), content
+
+    def close(self):
+        # Every thread opened its own connections
+        connections.close_all()
+
+
+class HttpClient:
+    """
+    Requests to a running server over one keep alive connection
+    """
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.connection = None
+
+    def send(self, method, path, body, headers):
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json", **headers}
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connection_class(self.netloc, timeout=60)
+            try:
+                self.connection.request(method, self.prefix + path, body=data, headers=headers)
+                response = self.connection.getresponse()
+                return response.status, response.getheader("Server-Timing"), response.read()
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed the kept alive connection, retry once on a new one
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Command(BaseCommand):
+    """
+    Load test of the REST API: seeds bench patients and assessments, replays a request mix from
+    concurrent clients and reports throughput, latency percentiles and queries per request, overall
+    and per request name. The result is written as JSON with the git commit so runs of different
+    commits can be compared (--compare).
+
+    Requests go through the whole middleware stack in this process by default, or to a running
+    server with --url. Queries per request are read from the Server-Timing header.
+
+    A mix (--mix) is a JSON lines file of {"name", "method", "path", "body", "auth", "weight"}
+    requests. path and body may hold {patient_id}, {assessment_id} (random seeded rows), {unique}
+    and {today} placeholders. With weights the requests are drawn at random, without them the file
+    is replayed in order, e.g. a mix recorded with --record. auth defaults to true, a bearer token of
+    the bench user is sent.
+
+    Seeded rows and users created by the mix are removed at the end unless --keep is given.
+    """
+    help = "Replay a request mix against the API and save throughput, latency and query counts as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=1000, help="Bench patients to seed")
+        parser.add_argument("--assessments", type=int, default=5, help="Assessments seeded per patient")
+        parser.add_argument("--requests", type=int, default=2000, help="Measured requests")
+        parser.add_argument("--warmup", type=int, default=50, help="Requests sent before measuring")
+        parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+        parser.add_argument("--mix", help="JSON lines request mix, the synthetic mix by default")
+        parser.add_argument("--record", help="Write the drawn request sequence to this JSON lines file, replayable with --mix")
+        parser.add_argument("--url", help="Base URL of a running server, requests are served in this process by default")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the data generator and the mix")
+        parser.add_argument("--output", help="Result file, benchmarks/<commit>-<time>.json by default")
+        parser.add_argument("--compare", help="Previous result file to compare with")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        run_id = uuid.uuid4().hex[:8]
+        mix = self.load_mix(options["mix"])
+
+        started_at = datetime.datetime.now().astimezone()
+        if not RegisteredUser.objects.filter(email=BENCH_EMAIL).exists():
+            RegisteredUser.objects.create_user(email=BENCH_EMAIL, password=BENCH_PASSWORD)
+        seed = self.seed(options["patients"], options["assessments"], run_id, rng)
+        try:
+            context = self.template_context()
+            templates = self.draw(mix, options["warmup"] + options["requests"], rng)
+            if options["record"]:
+                # Placeholders are kept, the seeded rows they stand for are gone after the run
+                with open(options["record"], "w") as fp:
+                    fp.writelines(json.dumps({key: value for key, value in template.items() if key != "weight"}) + "\n" for template in templates)
+            requests = self.build_requests(templates, context, run_id, rng)
+
+            if options["url"]:
+                def make_client():
+                    return HttpClient(options["url"])
+            else:
+                def make_client():
+                    return InProcessClient()
+
+            # The test client sends Host: testserver, allowed like Django's test runner does
+            with override_settings(SERVER_TIMING=True, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                token = self.login(make_client())
+                self.run(requests[:options["warmup"]], options["concurrency"], make_client, token)
+                results, elapsed = self.run(requests[options["warmup"]:], options["concurrency"], make_client, token)
+        finally:
+            if not options["keep"]:
+                self.cleanup()
+
+        report = self.report(results, elapsed)
+        database = connections["default"].settings_dict
+        report = {
+            "commit": self.git("rev-parse", "HEAD"),
+            "dirty": bool(self.git("status", "--porcelain", "--untracked-files=no")),
+            "started_at": started_at.isoformat(),
+            "target": options["url"] or "in-process",
+            "database": {"vendor": connections["default"].vendor, "engine": database["ENGINE"], "name": str(database["NAME"])},
+            "options": {name: options[name] for name in ("patients", "assessments", "requests", "warmup", "concurrency", "mix", "seed")},
+            "seed": seed,
+            **report,
+        }
+        output = options["output"] or os.path.join(
+            "benchmarks", f"{(report['commit'] or 'unknown')[:10]}-{started_at.strftime('%Y%m%d%H%M%S')}.json")
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+        self.print_report(report)
+        if options["compare"]:
+            with open(options["compare"]) as fp:
+                self.print_comparison(json.load(fp), report)
+        self.stdout.write(self.style.SUCCESS(f"Saved {output}"))
+
+    @staticmethod
+    def load_mix(path):
+        if path is None:
+            return SYNTHETIC_MIX
+        try:
+            with open(path) as fp:
+                mix = [json.loads(line) for line in fp if line.strip()]
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read the mix {path}: {e}")
+        for number, request in enumerate(mix, 1):
+            if not {"method", "path"} <= request.keys():
+                raise CommandError(f"{path}:{number}: a request needs a method and a path")
+            request.setdefault("name", f"{request['method']} {request['path'].split('?')[0]}")
+        if not mix:
+            raise CommandError(f"{path} has no requests")
+        return mix
+
+    def seed(self, patients, per_patient, run_id, rng):
+        """
+        Bulk insert synthetic patients and their assessments, in batches of SEED_BATCH_SIZE patients
+        """
+        start = time.perf_counter()
+        today = datetime.date.today()
+        assessment_count = 0
+        for batch_start in range(0, patients, SEED_BATCH_SIZE):
+            with transaction.atomic():
+                batch = PatientDetail.objects.bulk_create([
+                    PatientDetail(full_name=f"Bench Patient {run_id}-{i}", gender=rng.choice("FM"), phone_number=f"{BENCH_PREFIX}{run_id}-{i}",
+                                  date_of_birth=today - datetime.timedelta(days=rng.randrange(18 * 365, 90 * 365)),
+                                  address=rng.choice(("Kathmandu", "Lalitpur", "Bhaktapur", "Pokhara")), extras={"bench": run_id})
+                    for i in range(batch_start, min(batch_start + SEED_BATCH_SIZE, patients))
+                ])
+                assessments = Assessment.objects.bulk_create([
+                    Assessment(patient=patient, assessment_type=rng.choice(ASSESSMENT_TYPES),
+                               assessment_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(730)),
+                               questions_answers="1,2,3", final_score=Decimal(rng.randrange(2700)) / 100, extras={"bench": run_id})
+                    for patient in batch for _ in range(per_patient)
+                ])
+                add_to_rollups(assessments)
+            assessment_count += len(assessments)
+        response_cache.bump(PatientDetail, Assessment)
+        return {"patients": patients, "assessments": assessment_count, "seconds": time.perf_counter() - start}
+
+    @staticmethod
+    def template_context():
+        bench_patients = PatientDetail.objects.filter(phone_number__startswith=BENCH_PREFIX)
+        patient_ids = list(bench_patients.values_list("id", flat=True))
+        assessment_ids = list(Assessment.objects.filter(patient__in=bench_patients).values_list("id", flat=True))
+        if not patient_ids or not assessment_ids:
+            raise CommandError("No bench patients or assessments to send requests for, seed some with --patients and --assessments")
+        return {"patient_ids": patient_ids, "assessment_ids": assessment_ids, "today": datetime.date.today().isoformat()}
+
+    @staticmethod
+    def draw(mix, count, rng):
+        """
+        count requests of the mix, drawn by weight or in the order of the file
+        """
+        if any("weight" in request for request in mix):
+            return rng.choices(mix, weights=[request.get("weight", 1) for request in mix], k=count)
+        return list(itertools.islice(itertools.cycle(mix), count))
+
+    @staticmethod
+    def build_requests(templates, context, run_id, rng):
+        requests = []
+        for number, template in enumerate(templates):
+            values = {
+                "patient_id": rng.choice(context["patient_ids"]),
+                "assessment_id": rng.choice(context["assessment_ids"]),
+                "unique": f"{run_id}-r{number}",
+                "today": context["today"],
+            }
+            requests.append({
+                "name": template["name"],
+                "method": template["method"],
+                "path": fill(template["path"], values),
+                "body": fill(template.get("body"), values),
+                "auth": template.get("auth", True),
+            })
+        return requests
+
+    def login(self, client):
+        try:
+            status, _timing, content = client.send("POST", "/api/token/", {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}, {})
+        finally:
+            client.close()
+        if status != 200:
+            raise CommandError(f"Login of the bench user failed with status {status}: {content[:200]!r}")
+        return json.loads(content)["access_token"]
+
+    @staticmethod
+    def run(requests, concurrency, make_client, token):
+        """
+        Send requests from concurrency threads, each with its own client, returns the results and the wall time
+        """
+        results = [None] * len(requests)
+        positions = itertools.count()
+        lock = threading.Lock()
+
+        def worker():
+            client = make_client()
+            try:
+                while True:
+                    with lock:
+                        position = next(positions)
+                    if position >= len(requests):
+                        return
+                    request = requests[position]
+                    headers = {"Authorization": f"Bearer {token}"} if request["auth"] else {}
+                    start = time.perf_counter()
+                    try:
+                        status, timing, _content = client.send(request["method"], request["path"], request["body"], headers)
+                    except Exception as e:
+                        status, timing = f"error: {e.__class__.__name__}", None
+                    elapsed = time.perf_counter() - start
+                    match = SERVER_TIMING_DB.search(timing or "")
+                    queries = int(match.group(2)) if match else None
+                    results[position] = (request["name"], status, elapsed, queries)
+            finally:
+                client.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - start
+
+    @staticmethod
+    def report(results, elapsed):
+        def summarize(rows, seconds):
+            queries = [row[3] for row in rows if row[3] is not None]
+            statuses = Counter(str(row[1]) for row in rows)
+            return {
+                "requests": len(rows),
+                "errors": sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400),
+                "throughput": len(rows) / seconds if seconds else None,
+                "latency_ms": latency_summary([row[2] for row in rows]),
+                "queries_per_request": sum(queries) / len(queries) if queries else None,
+                "statuses": dict(sorted(statuses.items())),
+            }
+
+        names = sorted({row[0] for row in results})
+        return {
+            "seconds": elapsed,
+            # Throughput of one request name is its share of the run, requests/s of the mix as a whole
+            "total": summarize(results, elapsed),
+            "endpoints": {name: summarize([row for row in results if row[0] == name], elapsed) for name in names},
+        }
+
+    def print_report(self, report):
+        total = report["total"]
+        self.stdout.write(f"{report['database']['vendor']} {report['target']}, {total['requests']} requests in {report['seconds']:.2f}s, "
+                          f"{total['throughput']:.1f} requests/s, {total['errors']} errors")
+        self.stdout.write(f"{'request':<20}{'count':>7}{'req/s':>9}{'mean ms':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'errors':>8}")
+        for name, stats in [*report["endpoints"].items(), ("total", total)]:
+            latency = stats["latency_ms"]
+            queries = f"{stats['queries_per_request']:.1f}" if stats["queries_per_request"] is not None else "-"
+            self.stdout.write(f"{name:<20}{stats['requests']:>7}{stats['throughput']:>9.1f}{latency['mean']:>10.2f}{latency['p50']:>9.2f}"
+                              f"{latency['p95']:>9.2f}{latency['p99']:>9.2f}{queries:>9}{stats['errors']:>8}")
+
+    def print_comparison(self, previous, current):
+        def change(old, new):
+            return f"{(new - old) / old * 100:+.1f}%" if old else "-"
+
+        self.stdout.write(f"Compared with {(previous.get('commit') or 'unknown')[:10]} of {previous.get('started_at')}")
+        self.stdout.write(f"{'request':<20}{'req/s':>10}{'p50':>10}{'p95':>10}{'queries':>10}")
+        endpoints = {**current["endpoints"], "total": current["total"]}
+        old_endpoints = {**previous.get("endpoints", {}), "total": previous.get("total")}
+        for name, stats in endpoints.items():
+            old = old_endpoints.get(name)
+            if not old:
+                continue
+            queries = (change(old["queries_per_request"], stats["queries_per_request"])
+                       if old["queries_per_request"] is not None and stats["queries_per_request"] is not None else "-")
+            self.stdout.write(f"{name:<20}{change(old['throughput'], stats['throughput']):>10}"
+                              f"{change(old['latency_ms']['p50'], stats['latency_ms']['p50']):>10}"
+                              f"{change(old['latency_ms']['p95'], stats['latency_ms']['p95']):>10}{queries:>10}")
+
+    @staticmethod
+    def cleanup():
+        """
+        Delete the bench patients with their assessments and the bench users, then recompute the rollup rows they were part of
+        """
+        bench_patients = PatientDetail.objects.filter(phone_number__startswith=BENCH_PREFIX)
+        keys = assessment_rollup_keys(Assessment.objects.filter(patient__in=bench_patients))
+        patients_sql, params = bench_patients.values("id").query.sql_with_params()
+        with transaction.atomic():
+            # Plain DELETEs, QuerySet.delete() would load every assessment to send its signals
+            with connections["default"].cursor() as cursor:
+                cursor.execute(f"DELETE FROM {Assessment._meta.db_table} WHERE patient_id IN ({patients_sql})", params)
+                cursor.execute(f"DELETE FROM {PatientDetail._meta.db_table} WHERE id IN ({patients_sql})", params)
+            refresh_rollups(keys)
+        RegisteredUser.objects.filter(email__startswith=BENCH_PREFIX, email__endswith="@example.com").delete()
+        response_cache.bump(PatientDetail, Assessment)
+
+    @staticmethod
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from utils.pooled_postgresql.base import pool_stats
+
+
+class Command(BaseCommand):
+    """
+    Request shaped load on the database: every simulated request runs one query and then gets
+    the end of request connection handling (close_old_connections), from several threads.
+    Compare DATABASE_POOL=True, DATABASE_CONN_MAX_AGE=0 (a new connection per request) and
+    persistent connections against a local PostgreSQL.
+    """
+    help = "Measure requests/sec of one query per request under the configured connection mode"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per thread")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        database = options["database"]
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            own = []
+            for _ in range(options["requests"]):
+                start = time.perf_counter()
+                with connections[database].cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                close_old_connections()
+                own.append(time.perf_counter() - start)
+            connections[database].close()
+            with lock:
+                latencies.extend(own)
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        settings_dict = connections[database].settings_dict
+        self.stdout.write(f"engine {settings_dict['ENGINE']}, CONN_MAX_AGE {settings_dict['CONN_MAX_AGE']}")
+        self.stdout.write(f"{len(latencies) / elapsed:.1f} requests/s, p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+                          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+        stats = pool_stats().get(database)
+        if stats:
+            self.stdout.write(f"pool {stats}")
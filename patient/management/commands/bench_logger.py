@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from patient.views import patient_view
+from patient.views.patient_view import PatientAPIView
+from utils.logger import Logger, get_module_logger
+
+
+class Command(BaseCommand):
+    """
+    Micro-benchmark of the per-request logger setup done in the API views' __init__
+    """
+    help = "Compare building a Logger per request with the cached logger registry"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        module_file = patient_view.__file__
+        current_filename = os.path.basename(module_file).split('.')[0]
+        parent_directory = os.path.basename(os.path.dirname(module_file))
+
+        def uncached():
+            Logger(current_filename, settings.LOGGER, False).get_logger(folder_name=parent_directory)
+
+        def cached():
+            get_module_logger(module_file, settings.LOGGER)
+
+        def view_init():
+            PatientAPIView()
+
+        results = [
+            ("Logger(...).get_logger() per request", self.measure(uncached, iterations)),
+            ("get_module_logger() cached", self.measure(cached, iterations)),
+            ("PatientAPIView() instantiation", self.measure(view_init, iterations)),
+        ]
+        for name, seconds in results:
+            self.stdout.write(f"{name:<40} {seconds / iterations * 1e6:10.2f} us/request")
+        speedup = results[0][1] / results[1][1] if results[1][1] else float("inf")
+        self.stdout.write(self.style.SUCCESS(f"Cached logger lookup is {speedup:.1f}x faster than building a Logger per request"))
+
+    @staticmethod
+    def measure(func, iterations):
+        func()  # warm up, first call creates handlers and directories
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return time.perf_counter() - start
@@ -0,0 +1,79 @@
+import datetime
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from patient.models import Assessment, PatientDetail
+from patient.serializers import AssessmentSerializer, PatientDetailSerializer, assessment_values_serializer, patient_values_serializer
+
+
+class Command(BaseCommand):
+    """
+    Benchmark of the list serialization paths, ModelSerializer(many=True) against the values() fast path.
+    Rows are seeded inside a transaction which is rolled back at the end.
+    """
+    help = "Compare ModelSerializer and the values() fast path at several page sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"]
+        with transaction.atomic():
+            self.seed(max(sizes))
+            cases = [
+                ("patient", PatientDetail.objects.all(), PatientDetailSerializer, patient_values_serializer),
+                ("assessment", Assessment.objects.all(), AssessmentSerializer, assessment_values_serializer),
+            ]
+            self.stdout.write(f"{'model':<12}{'rows':>6}  {'measured':<18}{'serializer ms':>14}{'fast path ms':>14}{'speedup':>10}")
+            for name, queryset, serializer_class, values_serializer in cases:
+                for size in sizes:
+                    self.run_case(name, queryset, serializer_class, values_serializer, size, options["repeat"])
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        patients = PatientDetail.objects.bulk_create([
+            PatientDetail(full_name=f"Bench Patient {i}", gender="F", phone_number=f"bench-{i}",
+                          date_of_birth=datetime.date(1980, 1, 1) + datetime.timedelta(days=i), address="Kathmandu",
+                          extras={"index": i, "tags": ["bench"]})
+            for i in range(count)
+        ])
+        Assessment.objects.bulk_create([
+            Assessment(patient=patients[i], assessment_type="PHQ-9", assessment_date=datetime.date(2024, 1, 1),
+                       questions_answers="1,2,3", final_score=Decimal(i % 27) + Decimal("0.5"), extras={"index": i})
+            for i in range(count)
+        ])
+
+    def run_case(self, name, queryset, serializer_class, values_serializer, size, repeat):
+        renderer = JSONRenderer()
+
+        def model_serializer():
+            return serializer_class(list(queryset[:size]), many=True).data
+
+        def fast_path():
+            return values_serializer.serialize(list(values_serializer.values(queryset)[:size]))
+
+        if renderer.render(model_serializer()) != renderer.render(fast_path()):
+            raise CommandError(f"{name}: fast path output differs from {serializer_class.__name__}")
+
+        # Serialization alone, rows already fetched
+        instances = list(queryset[:size])
+        rows = list(values_serializer.values(queryset)[:size])
+        results = [
+            (self.measure(model_serializer, repeat), self.measure(fast_path, repeat)),
+            (self.measure(lambda: serializer_class(instances, many=True).data, repeat),
+             self.measure(lambda: values_serializer.serialize(rows), repeat)),
+        ]
+        for label, (slow, fast) in zip(("query + serialize", "serialize only"), results):
+            self.stdout.write(f"{name:<12}{size:>6}  {label:<18}{slow * 1000:>14.3f}{fast * 1000:>14.3f}{slow / fast:>9.1f}x")
+
+    @staticmethod
+    def measure(func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat
@@ -0,0 +1,286 @@
+import datetime
+import itertools
+import json
+import re
+from collections import Counter
+from contextlib import ExitStack
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from patient.models import Assessment, PatientDetail
+from patient.rollups import add_to_rollups
+from registered_users.authentication import user_cache
+from registered_users.models import RegisteredUser
+
+PASSWORD = "Tr0ub4dor&3-horse"
+FIXTURE_PATIENTS = 10
+FIXTURE_ASSESSMENTS = 3
+# Savepoints come from the transaction the whole check runs in, not from the views
+SAVEPOINT = re.compile(r"^(RELEASE |ROLLBACK TO )?SAVEPOINT ", re.IGNORECASE)
+PLACEHOLDER_LIST = re.compile(r"%s(?:, %s)+")
+VALUES_LIST = re.compile(r"(\([^()]*\))(?:, \1)+")
+
+
+def shape(sql):
+    """
+    SQL of a query with its placeholder and VALUES lists collapsed, the same for every page size
+    """
+    return VALUES_LIST.sub(r"\1, ...", PLACEHOLDER_LIST.sub("%s, ...", sql))
+
+
+class QueryRecorder:
+    """
+    Execute wrapper keeping the SQL of every query but savepoints
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not SAVEPOINT.match(sql):
+            self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+class Fixture:
+    """
+    Rows and credentials the cases send requests for, created inside the transaction of the check
+    """
+
+    def __init__(self):
+        self.user = RegisteredUser.objects.create_user(email="query-counts@example.com", password=PASSWORD)
+        refresh = RefreshToken.for_user(self.user)
+        self.refresh = str(refresh)
+        self.access = str(refresh.access_token)
+        patients = PatientDetail.objects.bulk_create([
+            PatientDetail(full_name=f"Query Count {i}", gender="F", phone_number=f"query-count-{i}",
+                          date_of_birth=datetime.date(1980, 1, 1) + datetime.timedelta(days=i), address="Kathmandu")
+            for i in range(FIXTURE_PATIENTS)
+        ])
+        assessments = Assessment.objects.bulk_create([
+            Assessment(patient=patient, assessment_type="PHQ-9", assessment_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i),
+                       questions_answers="1,2,3", final_score=Decimal(i * 3 + 1))
+            for patient in patients for i in range(FIXTURE_ASSESSMENTS)
+        ])
+        add_to_rollups(assessments)
+        self.patient_ids = [patient.pk for patient in patients]
+        self.assessment_ids = [assessment.pk for assessment in assessments]
+        self.counter = itertools.count()
+
+    def unique(self):
+        return next(self.counter)
+
+    def patient_body(self):
+        return {"full_name": "Query Count", "gender": "F", "phone_number": f"query-count-new-{self.unique()}",
+                "date_of_birth": "1990-01-01", "address": "Kathmandu"}
+
+    def assessment_body(self):
+        return {"patient_id": self.patient_ids[0], "assessment_type": "PHQ-9", "assessment_date": "2024-02-01",
+                "questions_answers": "1,2,3", "final_score": "10.00"}
+
+
+def page(name):
+    return lambda fixture, size: (f"{reverse(name)}?per_page={size}", None)
+
+
+def cursor_page(name):
+    return lambda fixture, size: (f"{reverse(name)}?cursor=&per_page={size}", None)
+
+
+# (url name, method, variant, request builder (fixture, size) -> (path, body), sized)
+# Sized cases run at every page size and must make the same number of queries at each of them.
+CASES = [
+    ("patient", "GET", "", page("patient"), True),
+    ("patient", "GET", " ?cursor", cursor_page("patient"), True),
+    ("patient", "POST", "", lambda fixture, size: (reverse("patient"), fixture.patient_body()), False),
+    ("patient_pk", "GET", "", lambda fixture, size: (f"{reverse('patient_pk', args=[fixture.patient_ids[0]])}?per_page={size}", None), True),
+    ("patient_pk", "PATCH", "", lambda fixture, size: (reverse("patient_pk", args=[fixture.patient_ids[0]]), {"address": "Lalitpur"}), False),
+    ("patient_pk", "DELETE", "", lambda fixture, size: (reverse("patient_pk", args=[fixture.patient_ids[0]]), None), False),
+    ("patient_bulk", "POST", "", lambda fixture, size: (reverse("patient_bulk"), [fixture.patient_body() for _ in range(size)]), True),
+    ("patient_export", "GET", "", lambda fixture, size: (reverse("patient_export"), None), False),
+    ("patient_timeline_batch", "GET", "",
+     lambda fixture, size: (f"{reverse('patient_timeline_batch')}?ids={','.join(map(str, fixture.patient_ids[:size]))}", None), True),
+    ("patient_timeline", "GET", "", lambda fixture, size: (reverse("patient_timeline", args=[fixture.patient_ids[0]]), None), False),
+    ("assessment", "GET", "", page("assessment"), True),
+    ("assessment", "GET", " ?cursor", cursor_page("assessment"), True),
+    ("assessment", "POST", "", lambda fixture, size: (reverse("assessment"), fixture.assessment_body()), False),
+    ("assessment_pk", "GET", "",
+     lambda fixture, size: (f"{reverse('assessment_pk', args=[fixture.assessment_ids[0]])}?per_page={size}", None), True),
+    ("assessment_pk", "PATCH", "",
+     lambda fixture, size: (reverse("assessment_pk", args=[fixture.assessment_ids[0]]), {"final_score": "11.00"}), False),
+    ("assessment_pk", "DELETE", "", lambda fixture, size: (reverse("assessment_pk", args=[fixture.assessment_ids[0]]), None), False),
+    ("assessment_bulk", "POST", "",
+     lambda fixture, size: (reverse("assessment_bulk"), [fixture.assessment_body() for _ in range(size)]), True),
+    ("assessment_export", "GET", "", lambda fixture, size: (reverse("assessment_export"), None), False),
+    ("assessment_analytics", "GET", "", lambda fixture, size: (f"{reverse('assessment_analytics')}?group_by=assessment_type,month", None), False),
+    ("assessment_daily_summary", "GET", "", lambda fixture, size: (f"{reverse('assessment_daily_summary')}?period=month", None), False),
+    ("user_registration", "POST", "", lambda fixture, size: (reverse("user_registration"), {
+        "email": f"query-count-{fixture.unique()}@example.com", "password": PASSWORD, "full_name": "Query Count"}), False),
+    ("token_obtain_pair", "POST", "",
+     lambda fixture, size: (reverse("token_obtain_pair"), {"email": fixture.user.email, "password": PASSWORD}), False),
+    ("token_refresh", "POST", "", lambda fixture, size: (reverse("token_refresh"), {"refresh": fixture.refresh}), False),
+    ("token_verify", "POST", "", lambda fixture, size: (reverse("token_verify"), {"token": fixture.access}), False),
+    ("metrics", "GET", "", lambda fixture, size: (reverse("metrics"), None), False),
+]
+UNAUTHENTICATED = {"user_registration", "token_obtain_pair", "token_refresh", "token_verify", "metrics"}
+# Methods of views shared by a collection and a detail route that only make sense on one of them
+NOT_ROUTED = {("patient", "PATCH"), ("patient", "DELETE"), ("patient_pk", "POST"),
+              ("assessment", "PATCH"), ("assessment", "DELETE"), ("assessment_pk", "POST")}
+
+
+def endpoint_methods():
+    """
+    {url name: {HTTP methods}} of every named route outside the admin
+    """
+    endpoints = {}
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.app_name != "admin":
+                    walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                view_class = getattr(pattern.callback, "view_class", None)
+                if view_class is None:
+                    methods = {"GET"}
+                else:
+                    methods = {method.upper() for method in view_class.http_method_names
+                               if method not in ("head", "options") and hasattr(view_class, method)}
+                endpoints[pattern.name] = methods
+
+    walk(get_resolver().url_patterns)
+    return endpoints
+
+
+class Command(BaseCommand):
+    """
+    Query count regression guard: sends one request per endpoint and method of patient/urls.py and
+    project/urls.py at every page size, records the number of queries and their SQL shapes, and
+    compares them with the baselines of the database vendor in the baseline file.
+
+    Fails when a request makes more queries than its baseline, when the count of a sized case grows
+    with the page size (an N+1), when a baseline is missing or the response status changed, and when
+    a route has a method without a case in CASES. Fewer queries or changed shapes are reported,
+    --update writes the new baselines.
+
+    Everything runs inside one transaction which is rolled back, each request in its own savepoint.
+    The response cache is off and the user cache cleared before every request, so counts do not
+    depend on the order of the cases.
+    """
+    help = "Compare the query counts of every endpoint with the recorded baselines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--baseline", default=str(settings.BASE_DIR / "query_counts.json"), help="Baseline file")
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10], help="Page sizes of the sized cases")
+        parser.add_argument("--update", action="store_true", help="Write the measured counts as the new baselines")
+
+    def handle(self, *args, **options):
+        sizes = sorted(set(options["sizes"]))
+        if sizes[-1] > FIXTURE_PATIENTS:
+            raise CommandError(f"Page sizes above {FIXTURE_PATIENTS}, the fixture size, are not supported")
+        failures = self.missing_cases()
+
+        # The test client sends Host: testserver, allowed like Django's test runner does
+        overrides = override_settings(RESPONSE_CACHE_ENABLED=False, METRICS_TOKEN="", ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+        with overrides, transaction.atomic():
+            fixture = Fixture()
+            measured = {f"{name} {method}{variant}": self.measure(fixture, name, method, builder, sizes if sized else [None])
+                        for name, method, variant, builder, sized in CASES}
+            transaction.set_rollback(True)
+
+        vendor = connections["default"].vendor
+        try:
+            with open(options["baseline"]) as fp:
+                baselines = json.load(fp)
+        except FileNotFoundError:
+            baselines = {}
+        baseline = baselines.get(vendor, {})
+
+        for key, result in measured.items():
+            counts = list(result["queries"].values())
+            if counts[-1] > counts[0]:
+                failures.append(f"{key}: queries grow with the page size {result['queries']}")
+            previous = baseline.get(key)
+            if options["update"]:
+                continue
+            if previous is None:
+                failures.append(f"{key}: no baseline, run with --update to record one")
+                continue
+            if result["status"] != previous["status"]:
+                failures.append(f"{key}: status {result['status']}, was {previous['status']}")
+            for size, count in result["queries"].items():
+                expected = previous["queries"].get(size)
+                if expected is None:
+                    failures.append(f"{key}: no baseline at page size {size}, run with --update to record one")
+                elif count > expected:
+                    failures.append(f"{key}: {count} queries at page size {size}, the baseline is {expected}\n"
+                                    + self.shape_diff(previous["shapes"], result["shapes"]))
+                elif count < expected:
+                    self.stdout.write(f"{key}: {count} queries at page size {size}, down from {expected}, run with --update to keep it")
+            if result["shapes"] != previous["shapes"] and all(
+                    count <= previous["queries"].get(size, count) for size, count in result["queries"].items()):
+                self.stdout.write(f"{key}: query shapes changed\n{self.shape_diff(previous['shapes'], result['shapes'])}")
+
+        for key, result in measured.items():
+            counts = ", ".join(f"{count}" if size == "-" else f"{count} at {size}" for size, count in result["queries"].items())
+            self.stdout.write(f"{key:<42}{result['status']:>5}  {counts}")
+
+        if options["update"]:
+            if failures:
+                raise CommandError("Baselines not updated:\n" + "\n".join(failures))
+            baselines[vendor] = measured
+            with open(options["baseline"], "w") as fp:
+                json.dump(baselines, fp, indent=2, sort_keys=True)
+                fp.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote the {vendor} baselines of {len(measured)} cases to {options['baseline']}"))
+        elif failures:
+            raise CommandError("Query count regressions:\n" + "\n".join(failures))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(measured)} cases within their {vendor} baselines"))
+
+    @staticmethod
+    def missing_cases():
+        covered = NOT_ROUTED | {(name, method) for name, method, _variant, _builder, _sized in CASES}
+        return [
+            f"{name} {method}: no case in check_query_counts.CASES"
+            for name, methods in sorted(endpoint_methods().items()) for method in sorted(methods) if (name, method) not in covered
+        ]
+
+    def measure(self, fixture, name, method, builder, sizes):
+        queries = {}
+        for size in sizes:
+            status, statements = self.request(fixture, name, method, builder, size)
+            queries["-" if size is None else str(size)] = len(statements)
+        # Shapes of the largest page size, where an N+1 shows most
+        return {"status": status, "queries": queries, "shapes": [shape(sql) for sql in statements]}
+
+    @staticmethod
+    def request(fixture, name, method, builder, size):
+        client = Client(raise_request_exception=True)
+        headers = {} if name in UNAUTHENTICATED else {"Authorization": f"Bearer {fixture.access}"}
+        path, body = builder(fixture, size)
+        user_cache.clear()
+        recorder = QueryRecorder()
+        with transaction.atomic():
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = client.generic(method, path, data=json.dumps(body) if body is not None else "",
+                                          content_type="application/json", headers=headers)
+                if response.streaming:
+                    # Streamed rows are read while the response is consumed
+                    b"".join(response.streaming_content)
+            transaction.set_rollback(True)
+        return response.status_code, recorder.statements
+
+    @staticmethod
+    def shape_diff(previous, current):
+        removed = Counter(previous) - Counter(current)
+        added = Counter(current) - Counter(previous)
+        return "\n".join([*(f"  - {count}x {sql}" for sql, count in removed.items()), *(f"  + {count}x {sql}" for sql, count in added.items())])
@@ -0,0 +1,7 @@
+from patient.importers import AssessmentImporter
+from patient.management.commands._import import ImportCommand
+
+
+class Command(ImportCommand):
+    help = "Bulk load assessments from CSV/NDJSON, patients are referenced by patient_id or patient_phone_number"
+    importer_class = AssessmentImporter
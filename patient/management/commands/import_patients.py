@@ -0,0 +1,7 @@
+from patient.importers import PatientImporter
+from patient.management.commands._import import ImportCommand
+
+
+class Command(ImportCommand):
+    help = "Bulk load patients from CSV/NDJSON, existing phone numbers are updated"
+    importer_class = PatientImporter
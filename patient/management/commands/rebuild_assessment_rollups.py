@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from patient.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    """
+    Backfill of the daily assessment rollups, and repair after writes that skipped the model
+    signals (QuerySet.update(), raw SQL)
+    """
+    help = "Recompute every assessment daily rollup row from the assessment table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Database alias to rebuild")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = rebuild_rollups(using=options["database"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup rows in {time.perf_counter() - start:.2f}s"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='assessment',
+            options={'ordering': ['-created_date', '-id'], 'verbose_name': 'Assessment', 'verbose_name_plural': 'Assessments'},
+        ),
+        migrations.AlterModelOptions(
+            name='patientdetail',
+            options={'ordering': ['-created_date', '-id'], 'verbose_name': 'Patient', 'verbose_name_plural': 'Patients'},
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['-created_date', '-id'], name='assessment_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientdetail',
+            index=models.Index(fields=['-created_date', '-id'], name='patient_created_id_idx'),
+        ),
+    ]
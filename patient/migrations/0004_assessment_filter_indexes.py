@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0003_patient_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['patient', 'assessment_date'], name='assessment_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['assessment_type', 'assessment_date'], name='assessment_type_date_idx'),
+        ),
+        # Superseded by assessment_patient_date_idx, dropped once that index exists
+        migrations.AlterField(
+            model_name='assessment',
+            name='patient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='patient.patientdetail'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0004_assessment_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assessment_type', models.CharField(max_length=100)),
+                ('assessment_date', models.DateField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('score_sum_squares', models.DecimalField(decimal_places=4, default=0, max_digits=32)),
+                ('score_min', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('score_max', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+            ],
+            options={
+                'verbose_name': 'Assessment Daily Rollup',
+                'verbose_name_plural': 'Assessment Daily Rollups',
+                'db_table': 'assessment_daily_rollup',
+                'ordering': ['assessment_type', 'assessment_date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='assessmentdailyrollup',
+            constraint=models.UniqueConstraint(fields=('assessment_type', 'assessment_date'), name='assessment_rollup_type_date_uniq'),
+        ),
+    ]
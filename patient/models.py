@@ -2,6 +2,9 @@ from datetime import date
 
 from django.db import models
 
+# Assessment fields its daily rollup row is derived from (patient.rollups)
+ROLLUP_FIELDS = ('assessment_type', 'assessment_date', 'final_score')
+
 
 class BaseModel(models.Model):
     extras = models.JSONField(default=dict)
@@ -31,14 +34,19 @@ class PatientDetail(BaseModel):
         db_table = 'patient'
         verbose_name = 'Patient'
         verbose_name_plural = 'Patients'
-        ordering = ['-created_date']
+        ordering = ['-created_date', '-id']
+        indexes = [
+            # Keyset pagination seeks on this ordering (see utils.pagination.CustomPagination)
+            models.Index(fields=['-created_date', '-id'], name='patient_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.full_name
 
 
 class Assessment(BaseModel):
-    patient = models.ForeignKey(PatientDetail, on_delete=models.CASCADE)
+    # Lookups by patient are served by the (patient, assessment_date) index below
+    patient = models.ForeignKey(PatientDetail, on_delete=models.CASCADE, db_index=False)
     assessment_type = models.CharField(max_length=100, null=True, blank=True)
     assessment_date = models.DateField(null=True, blank=True)
     questions_answers = models.CharField(max_length=100, null=True, blank=True)
@@ -48,7 +56,48 @@ class Assessment(BaseModel):
         db_table = 'assessment'
         verbose_name = 'Assessment'
         verbose_name_plural = 'Assessments'
-        ordering = ['-created_date']
+        ordering = ['-created_date', '-id']
+        indexes = [
+            # Keyset pagination seeks on this ordering (see utils.pagination.CustomPagination)
+            models.Index(fields=['-created_date', '-id'], name='assessment_created_id_idx'),
+            # Range scans for the list filters (see patient.filters.filter_assessments)
+            models.Index(fields=['patient', 'assessment_date'], name='assessment_patient_date_idx'),
+            models.Index(fields=['assessment_type', 'assessment_date'], name='assessment_type_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Rollup values as loaded, an update may move the assessment to another rollup row (patient.signals)
+        instance._loaded_rollup_values = tuple(instance.__dict__.get(name, models.DEFERRED) for name in ROLLUP_FIELDS)
+        return instance
 
     def __str__(self):
         return self.assessment_type
+
+
+class AssessmentDailyRollup(models.Model):
+    """
+    final_score aggregates of the scored assessments of one type on one day, maintained by
+    patient.rollups as assessments are written. Assessments without a date or a score are not
+    rolled up, assessments without a type are rolled up under "".
+    """
+    assessment_type = models.CharField(max_length=100)
+    assessment_date = models.DateField()
+    count = models.BigIntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    score_sum_squares = models.DecimalField(max_digits=32, decimal_places=4, default=0)
+    score_min = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    score_max = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+
+    class Meta:
+        db_table = 'assessment_daily_rollup'
+        verbose_name = 'Assessment Daily Rollup'
+        verbose_name_plural = 'Assessment Daily Rollups'
+        ordering = ['assessment_type', 'assessment_date']
+        constraints = [
+            models.UniqueConstraint(fields=['assessment_type', 'assessment_date'], name='assessment_rollup_type_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.assessment_type} {self.assessment_date}'
@@ -0,0 +1,188 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import connections, transaction
+from django.db.models import DEFERRED, Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from patient.models import ROLLUP_FIELDS, Assessment, AssessmentDailyRollup
+
+ROLLUP_COLUMNS = ('assessment_type', 'assessment_date', 'count', 'score_sum', 'score_sum_squares', 'score_min', 'score_max')
+# Rows per INSERT of add_to_rollups, 7 parameters each stay under the backends' parameter limits
+UPSERT_BATCH_SIZE = 1000
+# Days per query of refresh_rollups, keeps the OR of the keys under SQLite's expression depth limit
+REFRESH_BATCH_SIZE = 100
+
+
+def _key(assessment_type, assessment_date, final_score):
+    if assessment_date is None or final_score is None:
+        return None
+    return assessment_type or '', assessment_date
+
+
+def rollup_values(assessment):
+    return tuple(getattr(assessment, name) for name in ROLLUP_FIELDS)
+
+
+def rollup_key(assessment):
+    """
+    (assessment_type, assessment_date) rollup row of an assessment, None when it is not rolled up
+    """
+    return _key(*rollup_values(assessment))
+
+
+def loaded_rollup_key(assessment):
+    """
+    Rollup row of the values an assessment was loaded or last saved with (see Assessment.from_db)
+    """
+    loaded = getattr(assessment, '_loaded_rollup_values', None)
+    if loaded is None or DEFERRED in loaded:
+        return rollup_key(assessment)
+    return _key(*loaded)
+
+
+def changed_rollup_keys(assessment):
+    """
+    Rollup rows an update of assessment has to refresh, the one it was loaded with and its
+    current one. Empty when its type, date and score did not change.
+    """
+    loaded = getattr(assessment, '_loaded_rollup_values', None)
+    values = rollup_values(assessment)
+    if loaded == values:
+        return []
+    if loaded is None or DEFERRED in loaded:
+        return [_key(*values)]
+    return [_key(*loaded), _key(*values)]
+
+
+def assessment_rollup_keys(assessments):
+    """
+    Rollup rows the assessments of a queryset are part of, one DISTINCT query
+    """
+    rows = assessments.filter(assessment_date__isnull=False, final_score__isnull=False).values_list(
+        'assessment_type', 'assessment_date').distinct().order_by()
+    return {(assessment_type or '', assessment_date) for assessment_type, assessment_date in rows}
+
+
+def rollup_upsert_sql(source):
+    """
+    INSERT of rollup deltas from source (VALUES or SELECT of ROLLUP_COLUMNS) adding them to existing rows
+    """
+    table = AssessmentDailyRollup._meta.db_table
+    return f"""
+        INSERT INTO {table} ({', '.join(ROLLUP_COLUMNS)}) {source}
+        ON CONFLICT (assessment_type, assessment_date) DO UPDATE SET
+            count = {table}.count + EXCLUDED.count,
+            score_sum = {table}.score_sum + EXCLUDED.score_sum,
+            score_sum_squares = {table}.score_sum_squares + EXCLUDED.score_sum_squares,
+            score_min = CASE WHEN EXCLUDED.score_min < {table}.score_min THEN EXCLUDED.score_min ELSE {table}.score_min END,
+            score_max = CASE WHEN EXCLUDED.score_max > {table}.score_max THEN EXCLUDED.score_max ELSE {table}.score_max END
+    """
+
+
+def add_to_rollups(assessments, using='default'):
+    """
+    Add new assessments to their rollup rows with INSERT ... ON CONFLICT DO UPDATE statements
+    incrementing the existing rows, concurrent inserts of the same day serialize on the row lock
+    """
+    deltas = defaultdict(lambda: [0, 0, 0, None, None])
+    for assessment in assessments:
+        key = rollup_key(assessment)
+        if key is None:
+            continue
+        score = assessment.final_score
+        delta = deltas[key]
+        delta[0] += 1
+        delta[1] += score
+        delta[2] += score * score
+        delta[3] = score if delta[3] is None else min(delta[3], score)
+        delta[4] = score if delta[4] is None else max(delta[4], score)
+    if not deltas:
+        return
+
+    connection = connections[using]
+    field = AssessmentDailyRollup._meta.get_field
+    rows = [(*key, *delta) for key, delta in sorted(deltas.items())]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(batch))
+            params = [field(name).get_db_prep_save(value, connection) for row in batch for name, value in zip(ROLLUP_COLUMNS, row)]
+            cursor.execute(rollup_upsert_sql(f'VALUES {placeholders}'), params)
+
+
+def _keys_filter(keys):
+    return reduce(or_, (
+        Q(assessment_type=assessment_type, assessment_date=assessment_date) if assessment_type else
+        (Q(assessment_type='') | Q(assessment_type__isnull=True)) & Q(assessment_date=assessment_date)
+        for assessment_type, assessment_date in keys
+    ))
+
+
+def refresh_rollups(keys, using='default'):
+    """
+    Recompute the rollup rows of keys from their assessments, after updates and deletes.
+
+    Subtracting a removed score cannot restore min and max, so the rows of the affected days are
+    aggregated again (a range read on the (assessment_type, assessment_date) index). The rollup
+    rows are created if needed and locked first, so a concurrent write of the same day waits for
+    this transaction and sees its result.
+    """
+    keys = sorted(key for key in set(keys) if key is not None)
+    if not keys:
+        return
+    with transaction.atomic(using=using):
+        for start in range(0, len(keys), REFRESH_BATCH_SIZE):
+            _refresh(keys[start:start + REFRESH_BATCH_SIZE], using)
+
+
+def _refresh(keys, using):
+    rollups = AssessmentDailyRollup.objects.using(using)
+    rollups.bulk_create([AssessmentDailyRollup(assessment_type=key[0], assessment_date=key[1]) for key in keys],
+                        ignore_conflicts=True)
+    locked = {
+        (rollup.assessment_type, rollup.assessment_date): rollup
+        for rollup in rollups.select_for_update().filter(_keys_filter(keys)).order_by('assessment_type', 'assessment_date')
+    }
+    totals = Assessment.objects.using(using).filter(_keys_filter(keys), final_score__isnull=False).annotate(
+        rollup_type=Coalesce('assessment_type', Value('')),
+    ).values('rollup_type', 'assessment_date').annotate(
+        total=Count('final_score'), score_total=Sum('final_score'), squares_total=Sum(F('final_score') * F('final_score')),
+        lowest=Min('final_score'), highest=Max('final_score'),
+    ).order_by()
+    updated = []
+    for total in totals:
+        rollup = locked.pop((total['rollup_type'], total['assessment_date']))
+        rollup.count = total['total']
+        rollup.score_sum = total['score_total']
+        rollup.score_sum_squares = total['squares_total']
+        rollup.score_min = total['lowest']
+        rollup.score_max = total['highest']
+        updated.append(rollup)
+    rollups.bulk_update(updated, ROLLUP_COLUMNS[2:])
+    # Days left without scored assessments
+    rollups.filter(pk__in=[rollup.pk for rollup in locked.values()]).delete()
+
+
+def rebuild_rollups(using='default'):
+    """
+    Replace every rollup row with aggregates of the whole assessment table, returns the number of rows
+    """
+    table = AssessmentDailyRollup._meta.db_table
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Writers queue on the rollup table until the rebuild commits and then apply their change on top
+                cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(f"""
+                INSERT INTO {table} ({', '.join(ROLLUP_COLUMNS)})
+                SELECT COALESCE(assessment_type, ''), assessment_date, COUNT(*), SUM(final_score),
+                       SUM(final_score * final_score), MIN(final_score), MAX(final_score)
+                FROM {Assessment._meta.db_table}
+                WHERE assessment_date IS NOT NULL AND final_score IS NOT NULL
+                GROUP BY COALESCE(assessment_type, ''), assessment_date
+            """)
+            return cursor.rowcount
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from patient.models import Assessment, PatientDetail
+from utils.serializers import ValuesSerializer
 
 
 class PatientDetailSerializer(serializers.ModelSerializer):
@@ -38,3 +39,36 @@ class AssessmentSerializer(serializers.ModelSerializer):
             "created_date",
             "updated_date",
         ]
+
+
+class PatientBulkItemSerializer(PatientDetailSerializer):
+    """
+    Validates one item of a bulk create without touching the database,
+    phone number uniqueness is checked for the whole batch in patient.bulk
+    """
+
+    class Meta(PatientDetailSerializer.Meta):
+        extra_kwargs = {"phone_number": {"validators": []}}
+
+
+class AssessmentBulkItemSerializer(AssessmentSerializer):
+    """
+    Validates one item of a bulk create without touching the database,
+    patient ids are checked for the whole batch in patient.bulk
+    """
+    patient_id = serializers.IntegerField()
+
+
+class PatientTimelineSerializer(PatientDetailSerializer):
+    """
+    Patient with its assessments, read from the "timeline" prefetch of patient.timeline
+    """
+    assessments = AssessmentSerializer(source="timeline", many=True, read_only=True)
+
+    class Meta(PatientDetailSerializer.Meta):
+        fields = PatientDetailSerializer.Meta.fields + ["assessments"]
+
+
+# Read only fast paths used by the list and export endpoints
+patient_values_serializer = ValuesSerializer(PatientDetailSerializer)
+assessment_values_serializer = ValuesSerializer(AssessmentSerializer)
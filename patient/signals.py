@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from patient.models import Assessment, PatientDetail
+from patient.rollups import add_to_rollups, assessment_rollup_keys, changed_rollup_keys, loaded_rollup_key, refresh_rollups, rollup_values
+from utils.cache import response_cache
+
+
+@receiver([post_save, post_delete], sender=PatientDetail)
+@receiver([post_save, post_delete], sender=Assessment)
+def invalidate_cached_responses(sender, using, **kwargs):
+    """
+    Writes made outside the API views (admin, shell, cascades) invalidate the cached list responses too,
+    once the write is committed
+    """
+    transaction.on_commit(lambda: response_cache.bump(sender), using=using)
+
+
+@receiver(post_save, sender=Assessment)
+def update_rollups_on_save(sender, instance, created, using, **kwargs):
+    """
+    Maintain the daily rollups in the transaction of the write, when the caller opened one
+    """
+    if created:
+        add_to_rollups([instance], using=using)
+    else:
+        refresh_rollups(changed_rollup_keys(instance), using=using)
+    instance._loaded_rollup_values = rollup_values(instance)
+
+
+def deletes_patients(origin):
+    return isinstance(origin, PatientDetail) or (isinstance(origin, QuerySet) and origin.model is PatientDetail)
+
+
+@receiver(pre_delete, sender=PatientDetail)
+def collect_rollup_keys(sender, instance, using, origin, **kwargs):
+    """
+    Rollup rows of the assessments a patient delete cascades to, read once per delete() call
+    """
+    if deletes_patients(origin) and not hasattr(origin, '_rollup_keys'):
+        patients = {'patient__in': origin} if isinstance(origin, QuerySet) else {'patient': origin}
+        origin._rollup_keys = assessment_rollup_keys(Assessment.objects.using(using).filter(**patients))
+
+
+@receiver(pre_delete, sender=Assessment)
+def collect_assessment_rollup_keys(sender, instance, origin, **kwargs):
+    """
+    Rollup rows of the assessments a delete() call removes, gathered on its origin
+    """
+    if deletes_patients(origin):
+        # Read with one query in collect_rollup_keys
+        return
+    if not hasattr(origin, '_rollup_keys'):
+        origin._rollup_keys = set()
+    origin._rollup_keys.add(loaded_rollup_key(instance))
+
+
+@receiver(post_delete, sender=PatientDetail)
+@receiver(post_delete, sender=Assessment)
+def update_rollups_on_delete(sender, instance, using, origin, **kwargs):
+    # Every assessment row is gone by the first post_delete, one refresh covers the whole delete() call
+    keys = getattr(origin, '_rollup_keys', None)
+    if keys is not None:
+        del origin._rollup_keys
+        refresh_rollups(keys, using=using)
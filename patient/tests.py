@@ -0,0 +1,223 @@
+import json
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from patient.models import Assessment, AssessmentDailyRollup, PatientDetail
+from patient.rollups import rebuild_rollups
+from registered_users.models import RegisteredUser
+from utils.cache import response_cache
+
+
+def recorded_vendors():
+    try:
+        with open(settings.BASE_DIR / "query_counts.json") as fp:
+            return set(json.load(fp))
+    except FileNotFoundError:
+        return set()
+
+
+class QueryCountTests(TestCase):
+    """
+    Runs the check_query_counts guard, `manage.py test` fails on the regressions it reports
+    """
+
+    def test_query_counts_within_baselines(self):
+        if connection.vendor not in recorded_vendors():
+            self.skipTest(f"No {connection.vendor} baselines in query_counts.json, record them with check_query_counts --update")
+        try:
+            call_command("check_query_counts", stdout=StringIO())
+        except CommandError as e:
+            self.fail(str(e))
+
+
+class AuthenticatedAPITestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = RegisteredUser.objects.create_user(email="tests@example.com", password="pw12345!")
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+
+class PatientBulkTests(AuthenticatedAPITestCase):
+
+    def test_duplicate_phone_numbers_are_reported_per_item(self):
+        PatientDetail.objects.create(full_name="Existing", phone_number="9800000000")
+        PatientDetail.objects.create(full_name="Existing Empty", phone_number="")
+        items = [
+            {"full_name": "New", "phone_number": "9811111111"},
+            {"full_name": "Existing Duplicate", "phone_number": "9800000000"},
+            {"full_name": "Batch Duplicate", "phone_number": "9811111111"},
+            {"full_name": "Empty Duplicate", "phone_number": ""},
+            {"full_name": "No Phone", "phone_number": None},
+            {"full_name": "No Phone Again", "phone_number": None},
+        ]
+        response = self.client.post(reverse("patient_bulk"), items, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item["index"] for item in response.data["data"]], [0, 4, 5])
+        self.assertEqual([item["index"] for item in response.data["errors"]], [1, 2, 3])
+        self.assertEqual(PatientDetail.objects.filter(phone_number="9811111111").count(), 1)
+        self.assertEqual(PatientDetail.objects.filter(phone_number="").count(), 1)
+
+    def test_empty_phone_number_is_unique_within_the_batch(self):
+        items = [{"full_name": "First", "phone_number": ""}, {"full_name": "Second", "phone_number": ""}]
+        response = self.client.post(reverse("patient_bulk"), items, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["errors"], [{"index": 1, "errors": {"phone_number": ["Patient with this phone number already exists."]}}])
+
+
+class ResponseCacheInvalidationTests(AuthenticatedAPITestCase):
+
+    def test_update_bumps_generation_after_commit(self):
+        patient = PatientDetail.objects.create(full_name="Before")
+        generation = response_cache.generations([PatientDetail])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch(reverse("patient_pk", args=[patient.pk]), {"full_name": "After"}, format="json")
+            self.assertEqual(response.status_code, 200)
+            # A list read before the commit must not be cached under a generation newer than its rows
+            self.assertEqual(response_cache.generations([PatientDetail]), generation)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(response_cache.generations([PatientDetail]), generation)
+
+
+class PatientListTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.patients = [PatientDetail.objects.create(full_name=name, phone_number=phone)
+                         for name, phone in (("Asha Rai", "9800000001"), ("Bikash Rai", "9800000002"), ("Asha Karki", "9800000003"))]
+
+    def test_keyset_pages_link_both_ways(self):
+        url = reverse("patient")
+        first = self.client.get(url, {"cursor": "", "per_page": 2})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([row["id"] for row in first.data["results"]], [self.patients[2].pk, self.patients[1].pk])
+        self.assertIsNone(first.data["previous"])
+
+        second = self.client.get(first.data["next"])
+        self.assertEqual([row["id"] for row in second.data["results"]], [self.patients[0].pk])
+        self.assertIsNone(second.data["next"])
+
+        back = self.client.get(second.data["previous"])
+        self.assertEqual([row["id"] for row in back.data["results"]], [self.patients[2].pk, self.patients[1].pk])
+        self.assertIsNone(back.data["previous"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse("patient"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "Invalid cursor"})
+
+    def test_cursor_cannot_be_combined_with_search(self):
+        response = self.client.get(reverse("patient"), {"cursor": "", "q": "Asha"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cursor", response.data["error"])
+
+    def test_filters(self):
+        response = self.client.get(reverse("patient"), {"full_name": "asha"})
+        self.assertEqual(response.data["count"], 2)
+        response = self.client.get(reverse("patient"), {"q": "Rai", "phone_number": "0002"})
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.patients[1].pk])
+
+    def test_unchanged_list_is_not_modified(self):
+        url = reverse("patient")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        PatientDetail.objects.create(full_name="Chandra")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_stale_if_match_fails_the_update(self):
+        url = reverse("patient_pk", args=[self.patients[0].pk])
+        etag = self.client.patch(url, {"address": "Pokhara"}, format="json")["ETag"]
+        self.assertEqual(self.client.patch(url, {"address": "Lalitpur"}, format="json", HTTP_IF_MATCH=etag).status_code, 200)
+        response = self.client.patch(url, {"address": "Bhaktapur"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.patients[0].refresh_from_db()
+        self.assertEqual(self.patients[0].address, "Lalitpur")
+
+    def test_export_streams_filtered_rows(self):
+        response = self.client.get(reverse("patient_export"), {"full_name": "asha"})
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual({row["id"] for row in rows}, {self.patients[0].pk, self.patients[2].pk})
+
+        response = self.client.get(reverse("patient_export"), {"full_name": "asha", "format": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith("id,"))
+        self.assertEqual(len(lines), 3)
+
+
+class AssessmentTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.patient = PatientDetail.objects.create(full_name="Asha Rai")
+        self.other = PatientDetail.objects.create(full_name="Bikash Rai")
+
+    def create(self, patient, assessment_date, final_score, assessment_type="PHQ-9"):
+        response = self.client.post(reverse("assessment"), {
+            "patient_id": patient.pk, "assessment_type": assessment_type, "assessment_date": assessment_date,
+            "questions_answers": "1,2,3", "final_score": final_score,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data["data"]["id"]
+
+    def test_filters(self):
+        self.create(self.patient, "2024-01-01", "5.00")
+        expected = self.create(self.patient, "2024-01-05", "15.00")
+        self.create(self.other, "2024-01-05", "20.00")
+        response = self.client.get(reverse("assessment"), {
+            "patient_id": self.patient.pk, "date_from": "2024-01-02", "date_to": "2024-01-31", "min_score": "10",
+        })
+        self.assertEqual([row["id"] for row in response.data["results"]], [expected])
+
+        response = self.client.get(reverse("assessment"), {"date_from": "January"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": {"date_from": "Invalid value 'January'"}})
+
+    def test_bulk_reports_failures_by_index(self):
+        items = [
+            {"patient_id": self.patient.pk, "assessment_type": "GAD-7", "assessment_date": "2024-03-01", "final_score": "7.00"},
+            {"patient_id": 0, "assessment_type": "GAD-7", "assessment_date": "2024-03-01", "final_score": "7.00"},
+            {"patient_id": self.patient.pk, "final_score": "not a number"},
+        ]
+        response = self.client.post(reverse("assessment_bulk"), items, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item["index"] for item in response.data["data"]], [0])
+        self.assertEqual([item["index"] for item in response.data["errors"]], [1, 2])
+        self.assertIn("patient_id", response.data["errors"][0]["errors"])
+        self.assertIn("final_score", response.data["errors"][1]["errors"])
+
+        response = self.client.post(reverse("assessment_bulk"), items[1:], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["data"], [])
+
+    def test_rollups_match_a_rebuild(self):
+        def rollups():
+            return list(AssessmentDailyRollup.objects.values_list(
+                "assessment_type", "assessment_date", "count", "score_sum", "score_sum_squares", "score_min", "score_max"))
+
+        first = self.create(self.patient, "2024-01-01", "5.00")
+        second = self.create(self.patient, "2024-01-01", "9.00")
+        self.create(self.other, "2024-01-02", "12.00")
+        self.create(self.other, "2024-01-03", "3.00", assessment_type="GAD-7")
+        self.client.post(reverse("assessment_bulk"), [
+            {"patient_id": self.other.pk, "assessment_type": "PHQ-9", "assessment_date": "2024-01-01", "final_score": "1.00"},
+        ], format="json")
+        # Moves the score to another day, both days are refreshed
+        self.client.patch(reverse("assessment_pk", args=[second]), {"assessment_date": "2024-01-02", "final_score": "2.00"}, format="json")
+        self.client.delete(reverse("assessment_pk", args=[first]))
+        Assessment.objects.filter(assessment_type="GAD-7").delete()
+        self.client.delete(reverse("patient_pk", args=[self.other.pk]))
+
+        maintained = rollups()
+        rebuild_rollups()
+        self.assertEqual(maintained, rollups())
+        self.assertEqual(len(maintained), 1)
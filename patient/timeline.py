@@ -0,0 +1,17 @@
+from django.db.models import Prefetch
+
+from patient.filters import filter_assessments
+from patient.models import Assessment, PatientDetail
+
+
+def timeline_queryset(patient_ids, query_params):
+    """
+    Patients with their assessments prefetched into .timeline, newest assessment first.
+
+    Two queries whatever the number of patients: the patients, then the assessments of all of
+    them filtered by the assessment list query params (assessment_type, date_from/date_to, ...).
+    """
+    assessments = filter_assessments(Assessment.objects.all(), query_params).order_by('-assessment_date', '-created_date', '-id')
+    return PatientDetail.objects.filter(pk__in=patient_ids).prefetch_related(
+        Prefetch('assessment_set', queryset=assessments, to_attr='timeline')
+    )
@@ -1,11 +1,33 @@
+from django.conf import settings
 from django.urls import path
 
+from patient.views.analytics_view import AssessmentAnalyticsAPIView, AssessmentDailySummaryAPIView
 from patient.views.assessment_view import AssessmentAPIView
+from patient.views.async_view import AsyncAssessmentAPIView, AsyncPatientAPIView
+from patient.views.bulk_view import AssessmentBulkAPIView, PatientBulkAPIView
+from patient.views.export_view import AssessmentExportAPIView, PatientExportAPIView
 from patient.views.patient_view import PatientAPIView
+from patient.views.timeline_view import PatientTimelineAPIView
+
+
+def api_path(route, view, async_view, name):
+    """
+    path() served by the async implementation of the view when its name is listed in ASYNC_VIEWS
+    """
+    return path(route, (async_view if name in settings.ASYNC_VIEWS else view).as_view(), name=name)
+
 
 urlpatterns = [
-    path("patient/", PatientAPIView.as_view(), name="patient"),
-    path("patient/<int:pk>/", PatientAPIView.as_view(), name="patient_pk"),
-    path("assessment/", AssessmentAPIView.as_view(), name="assessment"),
-    path("assessment/<int:pk>/", AssessmentAPIView.as_view(), name="assessment_pk"),
+    api_path("patient/", PatientAPIView, AsyncPatientAPIView, name="patient"),
+    api_path("patient/<int:pk>/", PatientAPIView, AsyncPatientAPIView, name="patient_pk"),
+    path("patient/bulk/", PatientBulkAPIView.as_view(), name="patient_bulk"),
+    path("patient/export/", PatientExportAPIView.as_view(), name="patient_export"),
+    path("patient/timeline/", PatientTimelineAPIView.as_view(), name="patient_timeline_batch"),
+    path("patient/<int:pk>/timeline/", PatientTimelineAPIView.as_view(), name="patient_timeline"),
+    api_path("assessment/", AssessmentAPIView, AsyncAssessmentAPIView, name="assessment"),
+    api_path("assessment/<int:pk>/", AssessmentAPIView, AsyncAssessmentAPIView, name="assessment_pk"),
+    path("assessment/bulk/", AssessmentBulkAPIView.as_view(), name="assessment_bulk"),
+    path("assessment/export/", AssessmentExportAPIView.as_view(), name="assessment_export"),
+    path("assessment/analytics/", AssessmentAnalyticsAPIView.as_view(), name="assessment_analytics"),
+    path("assessment/analytics/daily/", AssessmentDailySummaryAPIView.as_view(), name="assessment_daily_summary"),
 ]
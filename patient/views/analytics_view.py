@@ -0,0 +1,112 @@
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from patient.analytics import parse_dimensions, rollup_statistics, score_statistics
+from patient.filters import filter_assessments, filter_rollups
+from patient.models import Assessment, AssessmentDailyRollup
+from project import settings
+from registered_users.authentication import token_user_authentication_classes
+from utils.logger import get_module_logger
+
+
+class AssessmentAnalyticsAPIView(APIView):
+    """
+    final_score statistics of the assessments matching the assessment list filters.
+
+    ?group_by= takes a comma separated list of assessment_type (default), month and age_band,
+    e.g. group_by=assessment_type,month for the monthly trend of each type. ?percentiles=25,50,75
+    and ?bins=10 shape the percentiles and the histogram of each group.
+    """
+    queryset = Assessment.objects.all()
+    authentication_classes = token_user_authentication_classes()
+    permission_classes = [IsAuthenticated]  # Used superuser credentials
+    default_percentiles = [25, 50, 75, 90]
+    default_bins = 10
+    max_bins = 100
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
+
+    def get_percentiles(self, query_params):
+        value = query_params.get('percentiles', None)
+        if not value:
+            return self.default_percentiles
+        try:
+            percentiles = [float(p) for p in value.split(',') if p.strip()]
+        except ValueError:
+            percentiles = []
+        if not percentiles or not all(0 <= p <= 100 for p in percentiles):
+            raise ValidationError({'percentiles': f'Invalid value {value!r}'})
+        return percentiles
+
+    def get_bins(self, query_params):
+        value = query_params.get('bins', None)
+        if not value:
+            return self.default_bins
+        try:
+            bins = int(value)
+        except ValueError:
+            bins = 0
+        if not 1 <= bins <= self.max_bins:
+            raise ValidationError({'bins': f'Expected a number of bins between 1 and {self.max_bins}'})
+        return bins
+
+    def get(self, request, *args, **kwargs):
+        try:
+            query_params = request.query_params
+            dimensions = parse_dimensions(query_params.get('group_by', None))
+            groups, bin_edges = score_statistics(
+                filter_assessments(self.queryset, query_params), dimensions,
+                self.get_percentiles(query_params), self.get_bins(query_params),
+            )
+            self.logger.info(f'Assessment Analytics Of {len(groups)} Groups Retrieved Successfully')
+            return Response({
+                "data": {"group_by": dimensions, "bin_edges": bin_edges, "groups": groups},
+                "message": "Successfully Received Assessment Analytics"
+            }, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            self.logger.error(f"Invalid Filter {e.detail} While Retrieving Assessment Analytics")
+            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            self.logger.error(f"Exception {e} While Retrieving Assessment Analytics")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AssessmentDailySummaryAPIView(APIView):
+    """
+    final_score count, mean, stddev, min and max per assessment type and ?period=day (default) or
+    month, served from the daily rollups for dashboards. Takes the assessment_type and
+    assessment_date/date_from/date_to filters, use analytics/ for percentiles, histograms and the
+    other filters.
+    """
+    queryset = AssessmentDailyRollup.objects.all()
+    authentication_classes = token_user_authentication_classes()
+    permission_classes = [IsAuthenticated]  # Used superuser credentials
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            period = request.query_params.get('period', None) or 'day'
+            groups = rollup_statistics(filter_rollups(self.queryset, request.query_params), period)
+            self.logger.info(f'Assessment Daily Summary Of {len(groups)} Groups Retrieved Successfully')
+            return Response({
+                "data": {"period": period, "groups": groups},
+                "message": "Successfully Received Assessment Daily Summary"
+            }, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            self.logger.error(f"Invalid Filter {e.detail} While Retrieving Assessment Daily Summary")
+            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            self.logger.error(f"Exception {e} While Retrieving Assessment Daily Summary")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
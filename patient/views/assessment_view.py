@@ -1,16 +1,19 @@
-import os
-
-from django.db.models import Q
+from django.db import transaction
+from django.utils.cache import get_conditional_response
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from patient.filters import filter_assessments
 from patient.models import Assessment
-from patient.serializers import AssessmentSerializer
+from patient.serializers import AssessmentSerializer, assessment_values_serializer
 from project import settings
-from utils.logger import Logger
+from registered_users.authentication import token_user_authentication_classes
+from utils.cache import response_cache
+from utils.conditional import conditional_list_response, resource_validators, set_validators
+from utils.logger import get_module_logger
 from utils.pagination import CustomPagination
 
 
@@ -19,69 +22,79 @@ class AssessmentAPIView(APIView):
     API endpoint that allows user to get assessments
     """
     queryset = Assessment.objects.all()
+    values_serializer = assessment_values_serializer
     serializer_class = AssessmentSerializer
     pagination_class = CustomPagination
+    authentication_classes = token_user_authentication_classes()
     permission_classes = [IsAuthenticated]  # Used superuser credentials
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        # Initialize the logger
-        current_filename = os.path.basename(__file__).split('.')[0]
-        # folder_name = os.path.dirname(os.path.abspath(__file__))
-        folder_name = os.path.dirname(__file__)
-        parent_directory = os.path.basename(folder_name)
-        try:
-            self.logger = Logger(
-                current_filename, settings.LOGGER, False).get_logger(folder_name=parent_directory)
-        except Exception as e:
-            raise Exception(e)
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             self.perform_create(serializer)
             self.logger.info("Assessment Created")
-            return Response({"data": serializer.data, "message": "Assessment Created Successfully"}, status=status.HTTP_201_CREATED)
+            return set_validators(Response({"data": serializer.data, "message": "Assessment Created Successfully"}, status=status.HTTP_201_CREATED),
+                                  *resource_validators(serializer.instance))
         return Response({"data": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
     def perform_create(self, serializer):
-        serializer.save()
+        # The daily rollup is updated in the same transaction (patient.signals)
+        with transaction.atomic():
+            serializer.save()
+        response_cache.bump(Assessment)
 
+    def get_list_queryset(self, request):
+        return filter_assessments(self.queryset, request.query_params)
+
+    @conditional_list_response(Assessment)
     def get(self, request, *args, **kwargs):
         try:
-            assessment_type = self.request.query_params.get('assessment_type', None)
-            assessment_date = self.request.query_params.get('assessment_date', None)
             paginator = self.pagination_class()
             # Filter data by query params
-            q = Q()
-            if assessment_type:
-                q &= Q(full_name__icontains=assessment_type)
-            if assessment_date:
-                q &= Q(phone_number__icontains=assessment_date)
-            queryset = self.queryset.filter(q)
+            queryset = self.get_list_queryset(request)
+            # Read rows with values() and the precomputed converters of the fast path serializer
+            queryset = self.values_serializer.values(queryset)
             page = paginator.paginate_queryset(queryset, request)
             if page is not None:
-                serializer = self.serializer_class(page, many=True)
+                data = self.values_serializer.serialize(page)
                 self.logger.info('Assessment Retrieved Successfully Paginated Data')
-                return paginator.get_paginated_response(serializer.data)
-            serializer = self.serializer_class(queryset, many=True)
+                return paginator.get_paginated_response(data)
+            data = self.values_serializer.serialize(queryset)
             self.logger.info('Assessment Retrieved Successfully Unpaginated Data')
-            return Response({"data": serializer.data, "message": "Successfully Received Assessment List"}, status=status.HTTP_200_OK)
+            return Response({"data": data, "message": "Successfully Received Assessment List"}, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            self.logger.error(f"Invalid Filter {e.detail} While Retrieving Assessment")
+            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             self.logger.error(f"Exception {e} While Retrieving Assessment")
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, *args, **kwargs):
         try:
-            assessment = Assessment.objects.get(pk=kwargs.get('pk'))
-            if not assessment:
-                raise ValidationError({'detail': 'Assessment not found'})
-            serializer = self.serializer_class(assessment, data=request.data, partial=True)
-            if serializer.is_valid():
-                self.perform_update(serializer)
+            with transaction.atomic():
+                # Lock the row while an If-Match/If-Unmodified-Since precondition is checked and applied
+                assessment = Assessment.objects.select_for_update().get(pk=kwargs.get('pk'))
+                if not assessment:
+                    raise ValidationError({'detail': 'Assessment not found'})
+                precondition_failed = get_conditional_response(request, *resource_validators(assessment))
+                if precondition_failed is not None:
+                    self.logger.error('Precondition Failed While Updating Assessment')
+                    return Response({"error": "Assessment was modified, fetch it again before updating"},
+                                    status=status.HTTP_412_PRECONDITION_FAILED)
+                serializer = self.serializer_class(assessment, data=request.data, partial=True)
+                valid = serializer.is_valid()
+                if valid:
+                    self.perform_update(serializer)
+            if valid:
                 self.logger.info('Assessment Updated')
-                return Response({"data": serializer.data, "message": "Assessment Updated Successfully"}, status=status.HTTP_200_OK)
+                return set_validators(Response({"data": serializer.data, "message": "Assessment Updated Successfully"}, status=status.HTTP_200_OK),
+                                      *resource_validators(assessment))
             self.logger.error('Something Went Wrong While Updating Assessment')
             return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -90,6 +103,8 @@ class AssessmentAPIView(APIView):
 
     def perform_update(self, serializer):
         serializer.save()
+        # Runs inside the row lock transaction of patch(), a read between the bump and the commit would cache the old row
+        transaction.on_commit(lambda: response_cache.bump(Assessment))
 
     def delete(self, request, pk):
         try:
@@ -97,6 +112,7 @@ class AssessmentAPIView(APIView):
             if not assessment:
                 raise ValidationError({'detail': 'Assessment not found'})
             assessment.delete()
+            response_cache.bump(Assessment)
             self.logger.info('Assessment Deleted')
             return Response({"message": "Assessment Deleted Successfully"}, status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
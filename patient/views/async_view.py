@@ -0,0 +1,204 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from patient.filters import filter_assessments, filter_patients
+from patient.models import Assessment, PatientDetail
+from patient.rollups import changed_rollup_keys, refresh_rollups, rollup_values
+from patient.serializers import AssessmentSerializer, PatientDetailSerializer, assessment_values_serializer, patient_values_serializer
+from project import settings
+from registered_users.authentication import token_user_authentication_classes
+from utils.async_views import AsyncAPIView
+from utils.cache import response_cache
+from utils.conditional import conditional_list_response, resource_validators, set_validators
+from utils.logger import get_module_logger
+from utils.pagination import CustomPagination
+
+
+class AsyncModelAPIView(AsyncAPIView):
+    """
+    Async implementation of the patient/assessment CRUD endpoints, same requests and responses
+    as the sync views.
+
+    Rows are read and written with the async ORM. Serializer validation may query the database
+    (unique phone number, patient_id lookup) and runs through sync_to_async. PATCH with
+    If-Match/If-Unmodified-Since swaps on updated_date instead of holding a row lock, the
+    update and after_update() run in one transaction through sync_to_async.
+    """
+    queryset = None
+    serializer_class = None
+    values_serializer = None
+    # Applies the list query parameters to the queryset, see patient.filters
+    filters = None
+    pagination_class = CustomPagination
+    authentication_classes = token_user_authentication_classes()
+    permission_classes = [IsAuthenticated]  # Used superuser credentials
+
+    name = None
+    # Models whose cached list responses are invalidated by a write, and by a delete
+    invalidates = ()
+    delete_invalidates = ()
+    created_message = None
+    updated_message = None
+    deleted_message = None
+    list_message = None
+    # Key of the validation errors in the 400 response of post()
+    create_errors_key = "error"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
+
+    def get_list_queryset(self, request):
+        return self.filters(self.queryset, request.query_params)
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            serializer = self.serializer_class(data=request.data)
+            if await sync_to_async(serializer.is_valid)():
+                serializer.instance = await self.queryset.model.objects.acreate(**serializer.validated_data)
+                response_cache.bump(*self.invalidates)
+                self.logger.info(f'{self.name} Created')
+                return set_validators(Response({"data": serializer.data, "message": self.created_message}, status=status.HTTP_201_CREATED),
+                                      *resource_validators(serializer.instance))
+            self.logger.error(f'Something Went Wrong While Creating {self.name}')
+            return Response({self.create_errors_key: serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            self.logger.error(f"Exception {e} While Creating {self.name}")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    async def list(self, request):
+        try:
+            paginator = self.pagination_class()
+            # Read rows with values() and the precomputed converters of the fast path serializer
+            queryset = self.values_serializer.values(self.get_list_queryset(request))
+            page = await paginator.apaginate_queryset(queryset, request)
+            if page is not None:
+                data = self.values_serializer.serialize(page)
+                self.logger.info(f'{self.name} Retrieved Successfully Paginated Data')
+                return paginator.get_paginated_response(data)
+            data = self.values_serializer.serialize([row async for row in queryset])
+            self.logger.info(f'{self.name} Retrieved Successfully Unpaginated Data')
+            return Response({"data": data, "message": self.list_message}, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            self.logger.error(f"Invalid Filter {e.detail} While Retrieving {self.name}")
+            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            self.logger.error(f"Exception {e} While Retrieving {self.name}")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    async def patch(self, request, *args, **kwargs):
+        try:
+            pk = kwargs.get('pk')
+            instance = await self.queryset.aget(pk=pk)
+            if get_conditional_response(request, *resource_validators(instance)) is not None:
+                return self.precondition_failed()
+            serializer = self.serializer_class(instance, data=request.data, partial=True)
+            if not await sync_to_async(serializer.is_valid)():
+                self.logger.error(f'Something Went Wrong While Updating {self.name}')
+                return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            previous_updated_date = instance.updated_date
+            for attr, value in serializer.validated_data.items():
+                setattr(instance, attr, value)
+            instance.updated_date = timezone.now()
+            queryset = self.queryset.filter(pk=pk)
+            if 'HTTP_IF_MATCH' in request.META or 'HTTP_IF_UNMODIFIED_SINCE' in request.META:
+                # Only update the version the precondition was checked against
+                queryset = queryset.filter(updated_date=previous_updated_date)
+            if not await sync_to_async(self.save_update)(queryset, instance, {**serializer.validated_data, 'updated_date': instance.updated_date}):
+                return self.precondition_failed()
+            response_cache.bump(*self.invalidates)
+            self.logger.info(f'{self.name} Updated')
+            return set_validators(Response({"data": serializer.data, "message": self.updated_message}, status=status.HTTP_200_OK),
+                                  *resource_validators(instance))
+        except Exception as e:
+            self.logger.error(f"Exception {e} While Updating {self.name}")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def save_update(self, queryset, instance, values):
+        """
+        Write the fields of patch() with QuerySet.update(), returns the number of updated rows
+        """
+        with transaction.atomic():
+            updated = queryset.update(**values)
+            if updated:
+                self.after_update(instance)
+        return updated
+
+    def after_update(self, instance):
+        """
+        Hook run in the transaction of the update, QuerySet.update() does not send the model signals
+        """
+
+    def precondition_failed(self):
+        self.logger.error(f'Precondition Failed While Updating {self.name}')
+        return Response({"error": f"{self.name} was modified, fetch it again before updating"},
+                        status=status.HTTP_412_PRECONDITION_FAILED)
+
+    async def delete(self, request, *args, **kwargs):
+        try:
+            instance = await self.queryset.aget(pk=kwargs.get('pk'))
+            await instance.adelete()
+            response_cache.bump(*self.delete_invalidates)
+            self.logger.info(f'{self.name} Deleted')
+            return Response({"message": self.deleted_message}, status=status.HTTP_204_NO_CONTENT)
+        except Exception as e:
+            self.logger.error(f"Exception {e} While Deleting {self.name}")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncPatientAPIView(AsyncModelAPIView):
+    """
+    Crud Operation Patient, async implementation of PatientAPIView
+    """
+    queryset = PatientDetail.objects.all()
+    values_serializer = patient_values_serializer
+    serializer_class = PatientDetailSerializer
+    filters = staticmethod(filter_patients)
+
+    name = 'Patient'
+    invalidates = (PatientDetail,)
+    delete_invalidates = (PatientDetail, Assessment)
+    created_message = "Patient created successfully"
+    updated_message = "Patient Updated Successfully"
+    deleted_message = "Patient Deleted Successfully"
+    list_message = "Successfully Received Patient List"
+
+    @conditional_list_response(PatientDetail)
+    async def get(self, request, *args, **kwargs):
+        return await self.list(request)
+
+
+class AsyncAssessmentAPIView(AsyncModelAPIView):
+    """
+    API endpoint that allows user to get assessments, async implementation of AssessmentAPIView
+    """
+    queryset = Assessment.objects.all()
+    values_serializer = assessment_values_serializer
+    serializer_class = AssessmentSerializer
+    filters = staticmethod(filter_assessments)
+
+    name = 'Assessment'
+    invalidates = (Assessment,)
+    delete_invalidates = (Assessment,)
+    created_message = "Assessment Created Successfully"
+    updated_message = "Assessment Updated Successfully"
+    deleted_message = "Assessment Deleted Successfully"
+    list_message = "Successfully Received Assessment List"
+    create_errors_key = "data"
+
+    def after_update(self, instance):
+        refresh_rollups(changed_rollup_keys(instance))
+        instance._loaded_rollup_values = rollup_values(instance)
+
+    @conditional_list_response(Assessment)
+    async def get(self, request, *args, **kwargs):
+        return await self.list(request)
@@ -0,0 +1,81 @@
+from django.db import IntegrityError
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from patient.bulk import bulk_create_assessments, bulk_create_patients
+from patient.models import Assessment, PatientDetail
+from project import settings
+from registered_users.authentication import token_user_authentication_classes
+from utils.cache import response_cache
+from utils.logger import get_module_logger
+
+
+class BulkCreateAPIView(APIView):
+    """
+    Creates many objects from a JSON array in one request,
+    valid items are inserted and invalid ones are reported by index
+    """
+    authentication_classes = token_user_authentication_classes()
+    permission_classes = [IsAuthenticated]  # Used superuser credentials
+    label = None
+    model = None
+    # Validates and inserts the items, returns (created, errors), see patient.bulk
+    create_items = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
+
+    def get_batch_size(self, request):
+        try:
+            batch_size = int(request.query_params.get('batch_size', settings.BULK_CREATE_BATCH_SIZE))
+        except ValueError:
+            batch_size = settings.BULK_CREATE_BATCH_SIZE
+        return max(1, min(batch_size, settings.BULK_CREATE_BATCH_SIZE))
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a list of items"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_CREATE_MAX_ITEMS:
+            return Response({"error": f"At most {settings.BULK_CREATE_MAX_ITEMS} items are allowed per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            created, errors = self.create_items(items, self.get_batch_size(request))
+        except IntegrityError as e:
+            self.logger.error(f"Exception {e} While Bulk Creating {self.label}")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # bulk_create sends no post_save signals
+        response_cache.bump(self.model)
+
+        self.logger.info(f'{len(created)} {self.label} Created, {len(errors)} Rejected')
+        response_status = status.HTTP_400_BAD_REQUEST if errors and not created else status.HTTP_201_CREATED
+        return Response(
+            {
+                "data": created,
+                "errors": errors,
+                "message": f"{len(created)} {self.label} Created Successfully"
+            },
+            status=response_status)
+
+
+class PatientBulkAPIView(BulkCreateAPIView):
+    """
+    Bulk create patients
+    """
+    label = 'Patients'
+    model = PatientDetail
+    create_items = staticmethod(bulk_create_patients)
+
+
+class AssessmentBulkAPIView(BulkCreateAPIView):
+    """
+    Bulk create assessments
+    """
+    label = 'Assessments'
+    model = Assessment
+    create_items = staticmethod(bulk_create_assessments)
@@ -0,0 +1,78 @@
+from django.http import StreamingHttpResponse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from patient.filters import filter_assessments, filter_patients
+from patient.models import Assessment, PatientDetail
+from patient.serializers import AssessmentSerializer, PatientDetailSerializer, assessment_values_serializer, patient_values_serializer
+from project import settings
+from registered_users.authentication import token_user_authentication_classes
+from utils.logger import get_module_logger
+from utils.renderers import CSVRenderer, NDJSONRenderer, csv_lines, ndjson_lines
+
+
+class ExportAPIView(APIView):
+    """
+    Streams every row matching the list view filters as NDJSON (default) or CSV (?format=csv).
+
+    Rows are read with a server side cursor in chunks of EXPORT_CHUNK_SIZE and encoded as they
+    are sent, so memory stays flat and the first bytes go out before the query is exhausted.
+    """
+    authentication_classes = token_user_authentication_classes()
+    permission_classes = [IsAuthenticated]  # Used superuser credentials
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    queryset = None
+    serializer_class = None
+    values_serializer = None
+    export_name = None
+    # Applies the list view query parameters to the queryset, see patient.filters
+    filters = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
+
+    def iter_rows(self, queryset):
+        to_representation = self.values_serializer.to_representation
+        fields = self.values_serializer.bind()
+        for row in self.values_serializer.values(queryset).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            yield to_representation(row, fields)
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filters(self.queryset, request.query_params)
+        # Bind the database chosen by the router now, rows are streamed after the request's routing context ended
+        queryset = queryset.using(queryset.db)
+        renderer = request.accepted_renderer
+        rows = self.iter_rows(queryset)
+        if renderer.format == CSVRenderer.format:
+            content = csv_lines(rows, self.serializer_class.Meta.fields)
+        else:
+            content = ndjson_lines(rows)
+        response = StreamingHttpResponse(content, content_type=f"{renderer.media_type}; charset={renderer.charset}")
+        response["Content-Disposition"] = f'attachment; filename="{self.export_name}.{renderer.format}"'
+        self.logger.info(f'{self.export_name} Export Started As {renderer.format}')
+        return response
+
+
+class PatientExportAPIView(ExportAPIView):
+    """
+    Export patients
+    """
+    queryset = PatientDetail.objects.all()
+    serializer_class = PatientDetailSerializer
+    values_serializer = patient_values_serializer
+    export_name = 'patients'
+    filters = staticmethod(filter_patients)
+
+
+class AssessmentExportAPIView(ExportAPIView):
+    """
+    Export assessments
+    """
+    queryset = Assessment.objects.all()
+    serializer_class = AssessmentSerializer
+    values_serializer = assessment_values_serializer
+    export_name = 'assessments'
+    filters = staticmethod(filter_assessments)
@@ -1,16 +1,19 @@
-import os
-
-from django.db.models import Q
+from django.db import transaction
+from django.utils.cache import get_conditional_response
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from patient.models import PatientDetail
-from patient.serializers import PatientDetailSerializer
+from patient.filters import filter_patients
+from patient.models import Assessment, PatientDetail
+from patient.serializers import PatientDetailSerializer, patient_values_serializer
 from project import settings
-from utils.logger import Logger
+from registered_users.authentication import token_user_authentication_classes
+from utils.cache import response_cache
+from utils.conditional import conditional_list_response, resource_validators, set_validators
+from utils.logger import get_module_logger
 from utils.pagination import CustomPagination
 
 
@@ -19,23 +22,17 @@ class PatientAPIView(APIView):
     Crud Operation Patient
     """
     queryset = PatientDetail.objects.all()
+    values_serializer = patient_values_serializer
     serializer_class = PatientDetailSerializer
     pagination_class = CustomPagination
+    authentication_classes = token_user_authentication_classes()
     permission_classes = [IsAuthenticated]  # Used superuser credentials
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        # Initialize the logger
-        current_filename = os.path.basename(__file__).split('.')[0]
-        # folder_name = os.path.dirname(os.path.abspath(__file__))
-        folder_name = os.path.dirname(__file__)
-        parent_directory = os.path.basename(folder_name)
-        try:
-            self.logger = Logger(
-                current_filename, settings.LOGGER, False).get_logger(folder_name=parent_directory)
-        except Exception as e:
-            raise Exception(e)
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
 
     def post(self, request):
         data = request.data
@@ -44,12 +41,12 @@ class PatientAPIView(APIView):
             if serializer.is_valid():
                 self.perform_create(serializer)
                 self.logger.info('Patient Created')
-                return Response(
+                return set_validators(Response(
                     {
                         "data": serializer.data,
                         "message": "Patient created successfully"
                     },
-                    status=status.HTTP_201_CREATED)
+                    status=status.HTTP_201_CREATED), *resource_validators(serializer.instance))
             self.logger.error('Something Went Wrong While Creating Patient')
             return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -58,41 +55,54 @@ class PatientAPIView(APIView):
 
     def perform_create(self, serializer):
         serializer.save()
+        response_cache.bump(PatientDetail)
+
+    def get_list_queryset(self, request):
+        return filter_patients(self.queryset, request.query_params)
 
+    @conditional_list_response(PatientDetail)
     def get(self, request, *args, **kwargs):
         try:
-            full_name = self.request.query_params.get('full_name', None)
-            phone_number = self.request.query_params.get('phone_number', None)
             paginator = self.pagination_class()
-            # Filter data by query params
-            q = Q()
-            if full_name:
-                q &= Q(full_name__icontains=full_name)
-            if phone_number:
-                q &= Q(phone_number__icontains=phone_number)
-            queryset = self.queryset.filter(q)
+            # Filter data by query params, ?q= gives ranked search over name and phone number
+            queryset = self.get_list_queryset(request)
+            # Read rows with values() and the precomputed converters of the fast path serializer
+            queryset = self.values_serializer.values(queryset)
             page = paginator.paginate_queryset(queryset, request)
             if page is not None:
-                serializer = self.serializer_class(page, many=True)
+                data = self.values_serializer.serialize(page)
                 self.logger.info('Patient Retrieved Successfully Paginated Data')
-                return paginator.get_paginated_response(serializer.data)
-            serializer = self.serializer_class(queryset, many=True)
+                return paginator.get_paginated_response(data)
+            data = self.values_serializer.serialize(queryset)
             self.logger.info('Patient Retrieved Successfully Unpaginated Data')
-            return Response({"data": serializer.data, "message": "Successfully Received Patient List"}, status=status.HTTP_200_OK)
+            return Response({"data": data, "message": "Successfully Received Patient List"}, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            self.logger.error(f"Invalid Filter {e.detail} While Retrieving Patient")
+            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             self.logger.error(f"Exception {e} While Retrieving Patient")
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, *args, **kwargs):
         try:
-            patient = PatientDetail.objects.get(pk=kwargs.get('pk'))
-            if not patient:
-                raise ValidationError({'detail': 'Patient not found'})
-            serializer = self.serializer_class(patient, data=request.data, partial=True)
-            if serializer.is_valid():
-                self.perform_update(serializer)
+            with transaction.atomic():
+                # Lock the row while an If-Match/If-Unmodified-Since precondition is checked and applied
+                patient = PatientDetail.objects.select_for_update().get(pk=kwargs.get('pk'))
+                if not patient:
+                    raise ValidationError({'detail': 'Patient not found'})
+                precondition_failed = get_conditional_response(request, *resource_validators(patient))
+                if precondition_failed is not None:
+                    self.logger.error('Precondition Failed While Updating Patient')
+                    return Response({"error": "Patient was modified, fetch it again before updating"},
+                                    status=status.HTTP_412_PRECONDITION_FAILED)
+                serializer = self.serializer_class(patient, data=request.data, partial=True)
+                valid = serializer.is_valid()
+                if valid:
+                    self.perform_update(serializer)
+            if valid:
                 self.logger.info('Patient Updated')
-                return Response({"data": serializer.data, "message": "Patient Updated Successfully"}, status=status.HTTP_200_OK)
+                return set_validators(Response({"data": serializer.data, "message": "Patient Updated Successfully"}, status=status.HTTP_200_OK),
+                                      *resource_validators(patient))
             self.logger.error('Something Went Wrong While Updating Patient')
             return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -101,6 +111,8 @@ class PatientAPIView(APIView):
 
     def perform_update(self, serializer):
         serializer.save()
+        # Runs inside the row lock transaction of patch(), a read between the bump and the commit would cache the old row
+        transaction.on_commit(lambda: response_cache.bump(PatientDetail))
 
     def delete(self, request, pk):
         try:
@@ -108,6 +120,7 @@ class PatientAPIView(APIView):
             if not patient:
                 raise ValidationError({'detail': 'Patient not found'})
             patient.delete()
+            response_cache.bump(PatientDetail, Assessment)
             self.logger.info('Patient Deleted')
             return Response({"message": "Patient Deleted Successfully"}, status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
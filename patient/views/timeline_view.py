@@ -0,0 +1,64 @@
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from patient.serializers import PatientTimelineSerializer
+from patient.timeline import timeline_queryset
+from project import settings
+from registered_users.authentication import token_user_authentication_classes
+from utils.logger import get_module_logger
+from utils.metrics import timing
+
+
+class PatientTimelineAPIView(APIView):
+    """
+    Patient with its assessment history in one response.
+
+    patient/<pk>/timeline/ returns one patient, patient/timeline/?ids=1,2,3 the timelines of up to
+    TIMELINE_MAX_IDS patients in the order of ids, unknown ids are left out. The assessment list
+    filters (assessment_type, date_from, date_to, ...) select the assessments included.
+    """
+    serializer_class = PatientTimelineSerializer
+    authentication_classes = token_user_authentication_classes()
+    permission_classes = [IsAuthenticated]  # Used superuser credentials
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
+
+    @staticmethod
+    def get_ids(query_params):
+        value = query_params.get('ids', '')
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in value.split(',') if pk.strip()))
+        except ValueError:
+            raise ValidationError({'ids': f'Invalid value {value!r}'})
+        if not ids:
+            raise ValidationError({'ids': 'Expected a comma separated list of patient ids'})
+        if len(ids) > settings.TIMELINE_MAX_IDS:
+            raise ValidationError({'ids': f'At most {settings.TIMELINE_MAX_IDS} ids are allowed per request'})
+        return ids
+
+    def get(self, request, pk=None):
+        try:
+            ids = [pk] if pk is not None else self.get_ids(request.query_params)
+            patients = {patient.pk: patient for patient in timeline_queryset(ids, request.query_params)}
+            if pk is not None and pk not in patients:
+                return Response({"error": "Patient not found"}, status=status.HTTP_404_NOT_FOUND)
+            with timing("serialize"):
+                if pk is not None:
+                    data = self.serializer_class(patients[pk]).data
+                else:
+                    data = self.serializer_class([patients[pk] for pk in ids if pk in patients], many=True).data
+            self.logger.info(f'Timeline Of {len(patients)} Patient Retrieved Successfully')
+            return Response({"data": data, "message": "Successfully Received Patient Timeline"}, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            self.logger.error(f"Invalid Filter {e.detail} While Retrieving Patient Timeline")
+            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            self.logger.error(f"Exception {e} While Retrieving Patient Timeline")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -49,11 +49,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.gzip.GZipMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -84,17 +86,53 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# DATABASE_POOL=True checks connections out of a per process pool (utils.pooled_postgresql) and
+# returns them at the end of each request, otherwise connections are kept open per thread for
+# DATABASE_CONN_MAX_AGE seconds and health checked before reuse
+DATABASE_POOL = os.environ.get("DATABASE_POOL", "False") == "True"
+DATABASE_ENGINE = os.environ.get(
+    "DATABASE_ENGINE", "utils.pooled_postgresql" if DATABASE_POOL else "django.db.backends.postgresql")
+
 DATABASES = {
     'default': {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": DATABASE_ENGINE,
         "NAME": os.environ.get("DATABASE_NAME"),
         "USER": os.environ.get("DATABASE_USERNAME"),
         "PASSWORD": os.environ.get("DATABASE_PASSWORD"),
         "HOST": os.environ.get("DATABASE_HOST", "localhost"),
         "PORT": os.environ.get("DATABASE_PORT", 5432),
+        "CONN_MAX_AGE": 0 if DATABASE_POOL else int(os.environ.get("DATABASE_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.environ.get("DATABASE_CONN_HEALTH_CHECKS", "True") == "True",
+        "POOL": {
+            "MAX_SIZE": int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10)),
+            "TIMEOUT": float(os.environ.get("DATABASE_POOL_TIMEOUT", 30)),
+            "MAX_LIFETIME": float(os.environ.get("DATABASE_POOL_MAX_LIFETIME", 3600)),
+            "MAX_IDLE": float(os.environ.get("DATABASE_POOL_MAX_IDLE", 600)),
+            "CHECK_IDLE": float(os.environ.get("DATABASE_POOL_CHECK_IDLE", 5)),
+            "STATS_INTERVAL": float(os.environ.get("DATABASE_POOL_STATS_INTERVAL", 60)),
+        },
     }
 }
 
+# Read replicas, comma separated hosts (DATABASE_REPLICA_HOSTS) and/or database names
+# (DATABASE_REPLICA_NAMES, e.g. a second SQLite file locally). Each replica becomes a replica_<n>
+# alias with the primary's other settings. GET/HEAD requests read from a replica, a client is
+# kept on the primary for REPLICA_STICKY_SECONDS after a successful write (read your writes)
+DATABASE_REPLICA_HOSTS = [host for host in os.environ.get("DATABASE_REPLICA_HOSTS", "").split(",") if host]
+DATABASE_REPLICA_NAMES = [name for name in os.environ.get("DATABASE_REPLICA_NAMES", "").split(",") if name]
+for index in range(max(len(DATABASE_REPLICA_HOSTS), len(DATABASE_REPLICA_NAMES))):
+    DATABASES[f"replica_{index + 1}"] = {
+        **DATABASES["default"],
+        "HOST": DATABASE_REPLICA_HOSTS[index] if index < len(DATABASE_REPLICA_HOSTS) else DATABASES["default"]["HOST"],
+        "NAME": DATABASE_REPLICA_NAMES[index] if index < len(DATABASE_REPLICA_NAMES) else DATABASES["default"]["NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ['utils.db_router.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+# Shared by the worker processes, point it to a shared cache backend in production
+REPLICA_STICKY_CACHE = os.environ.get("REPLICA_STICKY_CACHE", "default")
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -117,11 +155,97 @@ REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
 
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'registered_users.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'utils.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+
+}
 
+# Per request timings sent back in a Server-Timing header (utils.middleware.PerformanceMiddleware),
+# off by default as they tell any client how much database work a request takes, they are logged either way
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "False") == "True"
+
+# Prometheus metrics on /metrics (utils.metrics). With several worker processes set the
+# METRICS_MULTIPROC_DIR environment variable to an empty directory shared by the workers, emptied
+# at every deploy, so any worker answers with the totals of all of them. When METRICS_TOKEN is set
+# scrapes have to send it as a bearer token, otherwise only clients connecting from the comma separated
+# METRICS_ALLOWED_NETWORKS are served (the peer address, behind a reverse proxy set a token instead).
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOWED_NETWORKS = [
+    network.strip() for network in os.environ.get("METRICS_ALLOWED_NETWORKS", "127.0.0.0/8,::1/128").split(",") if network.strip()
+]
+
+# Slow query log (utils.slow_queries): queries of the views in SLOW_QUERY_VIEW_MODULES taking at least
+# SLOW_QUERY_MS go to logs/<date>/slow_queries.log. On PostgreSQL a SLOW_QUERY_EXPLAIN_SAMPLE_RATE share
+# of the slow SELECTs is run again with EXPLAIN (ANALYZE, BUFFERS) on a background thread, each distinct
+# statement at most once per SLOW_QUERY_EXPLAIN_INTERVAL seconds. Only the SQL with its placeholders is
+# logged, the parameters (patient names, phone numbers, ...) and the string literals of the plans are left
+# out unless SLOW_QUERY_LOG_PARAMS is on.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+SLOW_QUERY_VIEW_MODULES = [
+    module for module in os.environ.get("SLOW_QUERY_VIEW_MODULES", "patient.views,registered_users.views").split(",") if module]
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.1))
+SLOW_QUERY_EXPLAIN_INTERVAL = int(os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL", 300))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.environ.get("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", 10000))
+SLOW_QUERY_LOG_PARAMS = os.environ.get("SLOW_QUERY_LOG_PARAMS", "False") == "True"
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # List responses (utils.cache.ResponseCache), locmem keeps it per process, point it to a
+    # shared backend such as FileBasedCache for invalidations to reach every worker
+    'responses': {
+        'BACKEND': os.environ.get('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
 }
 
+# Off by default while the responses cache is the per process locmem backend, a write served by one worker
+# would not invalidate the entries of the others
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', str('RESPONSE_CACHE_BACKEND' in os.environ)) == 'True'
+
+# Bulk create endpoints (patient/bulk/, assessment/bulk/)
+BULK_CREATE_BATCH_SIZE = int(os.environ.get("BULK_CREATE_BATCH_SIZE", 500))
+BULK_CREATE_MAX_ITEMS = int(os.environ.get("BULK_CREATE_MAX_ITEMS", 5000))
+
+# URL names (patient.urls) served by the async views, e.g. "patient,patient_pk,assessment,assessment_pk".
+# Run under an ASGI server (uvicorn project.asgi:application) to benefit from them
+ASYNC_VIEWS = [name.strip() for name in os.environ.get("ASYNC_VIEWS", "").split(",") if name.strip()]
+
+# Rows fetched per server side cursor round trip by the export endpoints
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# Patients per batched timeline request (patient/timeline/?ids=...)
+TIMELINE_MAX_IDS = int(os.environ.get("TIMELINE_MAX_IDS", 100))
+
+# Assessment analytics (assessment/analytics/): lower bounds of the patient age bands and the
+# number of scores fetched per round trip while streaming them into NumPy
+ASSESSMENT_AGE_BANDS = [int(age) for age in os.environ.get("ASSESSMENT_AGE_BANDS", "18,30,45,60,75").split(",")]
+ANALYTICS_CHUNK_SIZE = int(os.environ.get("ANALYTICS_CHUNK_SIZE", 10000))
+
+# Users resolved from access tokens are kept in a process local cache (registered_users.authentication)
+JWT_USER_CACHE_TTL = int(os.environ.get("JWT_USER_CACHE_TTL", 60))
+JWT_USER_CACHE_MAX_ENTRIES = int(os.environ.get("JWT_USER_CACHE_MAX_ENTRIES", 10000))
+# Endpoints which only need IsAuthenticated use a stateless TokenUser built from the token claims
+JWT_STATELESS_USER = os.environ.get("JWT_STATELESS_USER", "False") == "True"
+
+# Concurrent password hashes of new users per process (registered_users.hashers.hash_password)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
+# Failed login throttling per email and per client address (registered_users.throttling),
+# counted in the process local default cache
+LOGIN_FAILURE_LIMIT = int(os.environ.get("LOGIN_FAILURE_LIMIT", 5))
+LOGIN_FAILURE_IDENT_LIMIT = int(os.environ.get("LOGIN_FAILURE_IDENT_LIMIT", 50))
+LOGIN_FAILURE_WINDOW = int(os.environ.get("LOGIN_FAILURE_WINDOW", 300))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -204,7 +328,11 @@ LOGGING = {
 LOGGER = {
     "loglevel": "DEBUG",
     "format": "%(levelname)s [%(asctime)s] %(process)d/%(thread)d %(folder_name)s %(filename)s %(funcName)s %(lineno)s : %(""message)s",
-    "date_format": "%Y-%m-%d %H:%M:%S"
+    "date_format": "%Y-%m-%d %H:%M:%S",
+    # Write log files from a background thread fed by a bounded queue (utils.logger.MultiProcessingLogHandler)
+    "async": os.environ.get("LOG_ASYNC", "True") == "True",
+    "queue_size": int(os.environ.get("LOG_QUEUE_SIZE", 10000)),
+    "batch_size": int(os.environ.get("LOG_BATCH_SIZE", 500)),
 }
 
 SIMPLE_JWT = {
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class RegisteredUsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'registered_users'
+
+    def ready(self):
+        from registered_users import signals  # noqa: F401
+        from registered_users.authentication import user_cache
+        from utils.metrics import cache_collector, registry
+
+        registry.register_collector(lambda: cache_collector("users", user_cache.stats()))
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Process local LRU of authenticated users with a short TTL.
+
+    Saving or deleting a user drops its entry in this process through the model signals, other
+    worker processes and QuerySet.update() writes are only caught up by the TTL (JWT_USER_CACHE_TTL).
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, user):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + settings.JWT_USER_CACHE_TTL, user)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > settings.JWT_USER_CACHE_MAX_ENTRIES:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication resolving the token's user through user_cache, the user is only read
+    from the database on the first request of a user and after the entry expired or was invalidated
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            # Raises for unknown and inactive users, those are never cached
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views, only a user missing from user_cache costs a thread hop
+        """
+        validated_token = self.get_request_token(request)
+        if validated_token is None:
+            return None
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            user = await sync_to_async(super().get_user)(validated_token)
+            user_cache.set(user_id, user)
+        return user, validated_token
+
+    def get_request_token(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return self.get_validated_token(raw_token)
+
+    @staticmethod
+    def get_user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    TokenUser authentication, nothing is read from the database so async views call it inline
+    """
+
+    async def aauthenticate(self, request):
+        return self.authenticate(request)
+
+
+def token_user_authentication_classes():
+    """
+    Authentication classes for endpoints that only need IsAuthenticated.
+
+    With JWT_STATELESS_USER on, request.user is a TokenUser built from the token claims and no
+    user is loaded at all, a deactivated user then keeps access until the access token expires.
+    """
+    if settings.JWT_STATELESS_USER:
+        return [StatelessJWTAuthentication]
+    return drf_settings.DEFAULT_AUTHENTICATION_CLASSES
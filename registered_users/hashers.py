@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.db import connections
+
+from project import settings
+from utils.logger import get_module_logger
+
+_executors = {}
+_executors_lock = threading.Lock()
+_hash_slots = None
+
+
+def get_executor(name, max_workers):
+    """
+    Named thread pool, created on first use in the worker process
+    """
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+    return executor
+
+
+def get_upgrade_executor():
+    # Single background thread re-hashing outdated passwords
+    return get_executor("password-upgrade", 1)
+
+
+def get_hash_slots():
+    global _hash_slots
+    if _hash_slots is None:
+        with _executors_lock:
+            if _hash_slots is None:
+                _hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS)
+    return _hash_slots
+
+
+def hash_password(password):
+    """
+    make_password() on the calling thread, at most PASSWORD_HASH_WORKERS at a time per process.
+
+    PBKDF2 releases the GIL, other request threads keep running while one hashes, and a burst
+    of signups keeps at most PASSWORD_HASH_WORKERS cores busy with hashing.
+    """
+    if password is None:
+        return make_password(None)
+    with get_hash_slots():
+        return make_password(password)
+
+
+def needs_upgrade(encoded):
+    hasher = identify_hasher(encoded)
+    return hasher.algorithm != get_hasher("default").algorithm or hasher.must_update(encoded)
+
+
+def verify_password(user, password):
+    """
+    Check the password against user.password with exactly one hash.
+
+    Unlike user.check_password(), a stored hash with an outdated algorithm or iteration count is
+    not re-hashed and saved on the spot, the upgrade is handed to a background thread.
+    """
+    encoded = user.password
+    if not check_password(password, encoded):
+        return False
+    if needs_upgrade(encoded):
+        get_upgrade_executor().submit(upgrade_password_hash, type(user), user.pk, password, encoded)
+    return True
+
+
+def upgrade_password_hash(model, pk, password, encoded):
+    try:
+        # Only replace the hash that was verified, a password changed meanwhile is left alone
+        model._default_manager.filter(pk=pk, password=encoded).update(password=make_password(password))
+    except Exception as e:
+        get_module_logger(__file__, settings.LOGGER).error(f"Exception {e} While Upgrading Password Hash")
+    finally:
+        connections.close_all()
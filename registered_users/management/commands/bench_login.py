@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import exceptions
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from registered_users.models import RegisteredUser
+from registered_users.serializers import UserLoginSerializer
+from registered_users.throttling import login_failure_throttle
+
+
+class Command(BaseCommand):
+    """
+    Login throughput of TokenObtainPairSerializer against the single hash UserLoginSerializer,
+    measured in CPU time of this process so the numbers read as logins per second per core.
+    The bench user is created inside a transaction which is rolled back at the end.
+    """
+    help = "Measure logins/sec per core of the login serializers"
+
+    email = "bench-login@example.com"
+    password = "bench-login-password"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=10)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            RegisteredUser.objects.create_user(email=self.email, password=self.password)
+
+            def credentials(i, email=self.email, password=self.password):
+                # A distinct client address per attempt keeps the per address failure counter out of the way
+                request = factory.post("/api/token/", REMOTE_ADDR=f"10.0.{i // 256 % 256}.{i % 256}")
+                return {"data": {"email": email, "password": password}, "context": {"request": request}}
+
+            def valid(serializer_class):
+                return lambda i: serializer_class(**credentials(i)).is_valid(raise_exception=True)
+
+            def unknown_email(serializer_class):
+                def login(i):
+                    try:
+                        serializer_class(**credentials(i, email=f"unknown-{i}@example.com")).is_valid()
+                    except exceptions.AuthenticationFailed:
+                        pass
+                return login
+
+            blocked_email = "bench-blocked@example.com"
+            for _ in range(settings.LOGIN_FAILURE_LIMIT):
+                login_failure_throttle.failure(blocked_email, None)
+
+            def throttled(i):
+                try:
+                    UserLoginSerializer(**credentials(i, email=blocked_email, password="wrong")).is_valid()
+                except exceptions.Throttled:
+                    pass
+
+            cases = [
+                ("valid login", "TokenObtainPairSerializer", valid(TokenObtainPairSerializer)),
+                ("valid login", "UserLoginSerializer", valid(UserLoginSerializer)),
+                ("unknown email", "TokenObtainPairSerializer", unknown_email(TokenObtainPairSerializer)),
+                ("unknown email", "UserLoginSerializer", unknown_email(UserLoginSerializer)),
+                ("throttled email", "UserLoginSerializer", throttled),
+            ]
+            self.stdout.write(f"{'case':<18}{'serializer':<28}{'ms/login':>10}{'logins/s/core':>16}")
+            for case, name, func in cases:
+                seconds = self.measure(func, iterations)
+                self.stdout.write(f"{case:<18}{name:<28}{seconds * 1000:>10.3f}{1 / seconds:>16.1f}")
+
+            for email in [self.email, blocked_email] + [f"unknown-{i}@example.com" for i in range(-1, iterations)]:
+                login_failure_throttle.success(email)
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(func, iterations):
+        func(-1)  # warm up
+        start = time.process_time()
+        for i in range(iterations):
+            func(i)
+        return (time.process_time() - start) / iterations
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from registered_users.models import RegisteredUser
+from registered_users.views import UsersRegistrationAPIView
+
+
+class Command(BaseCommand):
+    """
+    Signup throughput of UsersRegistrationAPIView, for new users and for duplicate emails.
+    Runs in autocommit like the endpoint does, the bench users are deleted at the end.
+    """
+    help = "Measure signups/sec and queries per signup of the registration endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=10)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        factory = APIRequestFactory()
+        view = UsersRegistrationAPIView.as_view()
+
+        def signup(email, expected_status):
+            def post(i):
+                request = factory.post("/api/v1/register/", {
+                    "email": email.format(i=i),
+                    "password": "bench-signup-password",
+                }, format="json")
+                response = view(request)
+                if response.status_code != expected_status:
+                    raise CommandError(f"Expected {expected_status}, got {response.status_code}: {response.data}")
+            return post
+
+        cases = [
+            ("new user", signup("bench-signup-{i}@example.com", 201)),
+            ("duplicate email", signup("bench-signup-0@example.com", 400)),
+        ]
+        self.stdout.write(f"{'case':<18}{'ms/signup':>10}{'signups/s':>12}{'queries':>9}")
+        try:
+            for name, func in cases:
+                seconds, queries = self.measure(func, iterations)
+                self.stdout.write(f"{name:<18}{seconds * 1000:>10.3f}{1 / seconds:>12.1f}{queries:>9}")
+        finally:
+            RegisteredUser.objects.filter(email__startswith="bench-signup-", email__endswith="@example.com").delete()
+
+    @staticmethod
+    def measure(func, iterations):
+        func(0)  # warm up, creates the user the duplicate case collides with
+        with CaptureQueriesContext(connection) as context:
+            func(iterations + 1)
+        start = time.perf_counter()
+        for i in range(1, iterations + 1):
+            func(i)
+        return (time.perf_counter() - start) / iterations, len(context.captured_queries)
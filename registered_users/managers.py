@@ -1,6 +1,8 @@
 from django.contrib.auth.base_user import BaseUserManager
 from django.utils.translation import gettext_lazy as _
 
+from registered_users.hashers import hash_password
+
 
 class CustomUserManager(BaseUserManager):
     """
@@ -23,9 +25,9 @@ class CustomUserManager(BaseUserManager):
             email
         )  # Normalize the email address by lowercase the domain part of it.
         user = self.model(email=email, **extra_fields)
-        user.set_password(
+        user.password = hash_password(
             password
-        )  # set_password hashes plain password in encrypted form
+        )  # hashes plain password in encrypted form, bounded by PASSWORD_HASH_WORKERS
 
         user.save(using=self._db)
         return user
@@ -1,7 +1,15 @@
-from django.contrib.auth import authenticate, get_user_model
-from rest_framework import serializers
+from contextlib import nullcontext
 
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, serializers
+from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from registered_users.hashers import verify_password
 from registered_users.models import RegisteredUser
+from registered_users.throttling import login_failure_throttle
 
 
 class RegisteredUserSerializers(serializers.ModelSerializer):
@@ -22,53 +30,85 @@ class RegisteredUserSerializers(serializers.ModelSerializer):
             "phone_number",
         ]
 
-    def validate(self, data):
-        phone_number = data.get('phone_number')
-        usr = RegisteredUser.objects.filter(phone_number=phone_number).first()
-        if usr:
-            raise serializers.ValidationError({"phone_number": "User already exists"})
-        return data
+    def get_fields(self):
+        fields = super().get_fields()
+        # Uniqueness is enforced by the INSERT itself, see create()
+        for name in ("email", "phone_number"):
+            fields[name].validators = [
+                validator for validator in fields[name].validators if not isinstance(validator, UniqueValidator)
+            ]
+        return fields
 
     def create(self, validated_data):
-        """ Create Users :param validated_data: :return: user """
-        user = RegisteredUser.objects.create_user(**validated_data)
+        """ Create Users with a single INSERT :param validated_data: :return: user """
+        # A savepoint is only needed inside a transaction, in autocommit the failed INSERT leaves nothing to roll back
+        in_transaction = transaction.get_connection().in_atomic_block
+        try:
+            with transaction.atomic() if in_transaction else nullcontext():
+                user = RegisteredUser.objects.create_user(**validated_data)
+        except IntegrityError as e:
+            raise serializers.ValidationError(self.unique_violation(e))
 
         return user
 
+    @staticmethod
+    def unique_violation(error):
+        """
+        Map a unique constraint violation to the error UniqueValidator gives for that field
+        """
+        message = str(error)
+        for name in ("phone_number", "email"):
+            if name in message:
+                model_field = RegisteredUser._meta.get_field(name)
+                return {name: [model_field.error_messages["unique"] % {
+                    "model_name": RegisteredUser._meta.verbose_name,
+                    "field_label": model_field.verbose_name,
+                }]}
+        raise error
+
 
 class UserLoginSerializer(serializers.Serializer):
     """
-    User Login Serializer which takes email and password fields to login
+    User Login Serializer which takes email and password fields to login.
+    Returns the access and refresh tokens of the user.
     """
 
-    email = serializers.EmailField()
+    # Not an EmailField, a malformed email fails like unknown credentials (401) instead of a 400
+    email = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
+    default_error_messages = {
+        "no_active_account": _("No active account found with the given credentials")
+    }
+
     def validate(self, data):
         """
-        Validates email and password
+        Validates email and password with one user lookup and one password hash,
+        throttled clients are rejected before either
         :param data: email, password
-        :return: user
+        :return: user, access and refresh tokens
         """
         email = data.get("email")
         password = data.get("password")
 
-        user = get_user_model().objects.filter(email=email).first()
-        if not user:
-            raise serializers.ValidationError(
-                detail={"email": "Email is not matched !!"}
-            )
-        verify_pass = user.check_password(password)
-        if not verify_pass:
-            raise serializers.ValidationError(
-                detail={"password": "Password not matched !!"}
-            )
-
-        user = authenticate(email=email, password=password)
-
-        if user is None:
-            raise serializers.ValidationError("You are not valid User !! ")
-
+        request = self.context.get("request")
+        ident = login_failure_throttle.get_ident(request) if request is not None else None
+        wait = login_failure_throttle.wait(email, ident)
+        if wait is not None:
+            raise exceptions.Throttled(wait)
+
+        user_model = get_user_model()
+        user = user_model._default_manager.filter(**{user_model.USERNAME_FIELD: email}).only(
+            "id", "password", "is_active").first()
+        # Unknown and inactive users fail without hashing the password
+        if user is None or not user.is_active or not verify_password(user, password):
+            login_failure_throttle.failure(email, ident)
+            raise exceptions.AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        login_failure_throttle.success(email)
+
+        refresh = RefreshToken.for_user(user)
         data["user"] = user
+        data["refresh"] = str(refresh)
+        data["access"] = str(refresh.access_token)
 
         return data
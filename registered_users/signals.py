@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from registered_users.authentication import user_cache
+from registered_users.models import RegisteredUser
+
+
+@receiver([post_save, post_delete], sender=RegisteredUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Saved (deactivated, password changed, ...) and deleted users are read again on their next request
+    """
+    user_cache.invalidate(instance.pk)
@@ -0,0 +1,69 @@
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from registered_users.models import RegisteredUser
+
+
+class RegistrationTests(APITestCase):
+
+    def register(self, **fields):
+        return self.client.post(reverse("user_registration"), {"password": "pw12345!", **fields}, format="json")
+
+    def test_register(self):
+        response = self.register(email="asha@example.com", phone_number="9800000000")
+        self.assertEqual(response.status_code, 201)
+        user = RegisteredUser.objects.get(pk=response.data["user_id"])
+        self.assertTrue(user.check_password("pw12345!"))
+
+    def test_unique_violations_map_to_their_field(self):
+        self.register(email="asha@example.com", phone_number="9800000000")
+
+        response = self.register(email="asha@example.com")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"data": {"email": ["registered user with this email already exists."]}})
+
+        response = self.register(email="bikash@example.com", phone_number="9800000000")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"data": {"phone_number": ["registered user with this phone number already exists."]}})
+        self.assertEqual(RegisteredUser.objects.count(), 1)
+
+
+@override_settings(LOGIN_FAILURE_LIMIT=2)
+class LoginThrottleTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        RegisteredUser.objects.create_user(email="asha@example.com", password="pw12345!")
+
+    def setUp(self):
+        # Failure counters live in the process local default cache
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+
+    def login(self, password, email="asha@example.com"):
+        return self.client.post(reverse("token_obtain_pair"), {"email": email, "password": password}, format="json")
+
+    def test_login(self):
+        response = self.login("pw12345!")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {"access_token", "refresh_token"})
+
+    def test_unknown_credentials_are_unauthorized(self):
+        self.assertEqual(self.login("wrong").status_code, 401)
+        self.assertEqual(self.login("pw12345!", email="nobody@example.com").status_code, 401)
+
+    def test_repeated_failures_are_throttled(self):
+        self.assertEqual(self.login("wrong").status_code, 401)
+        self.assertEqual(self.login("wrong").status_code, 401)
+        # Blocked before the password is checked, the right one included
+        response = self.login("pw12345!")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_success_resets_the_failures(self):
+        self.assertEqual(self.login("wrong").status_code, 401)
+        self.assertEqual(self.login("pw12345!").status_code, 200)
+        self.assertEqual(self.login("wrong").status_code, 401)
+        self.assertEqual(self.login("pw12345!").status_code, 200)
@@ -0,0 +1,84 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+class LoginFailureThrottle:
+    """
+    Fixed window counters of failed logins per email and per client address.
+
+    Counters live in the process local default cache and are checked before the user lookup
+    and the password hash, a blocked email or address costs one cache read.
+    """
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def get_ident(request):
+        # Same client address resolution as DRF's throttles, honours REST_FRAMEWORK['NUM_PROXIES']
+        return BaseThrottle().get_ident(request)
+
+    @staticmethod
+    def email_key(email):
+        digest = hashlib.sha1(email.strip().lower().encode()).hexdigest()
+        return f"login-failures:email:{digest}"
+
+    @staticmethod
+    def ident_key(ident):
+        return f"login-failures:ident:{ident}"
+
+    @staticmethod
+    def expiry_key(key):
+        return f"{key}:expires"
+
+    def wait(self, email, ident):
+        """
+        Seconds left in the window of the blocking counters, None when the client is not blocked
+        """
+        keys = {self.email_key(email): settings.LOGIN_FAILURE_LIMIT}
+        if ident:
+            keys[self.ident_key(ident)] = settings.LOGIN_FAILURE_IDENT_LIMIT
+        values = self.cache.get_many([*keys, *map(self.expiry_key, keys)])
+        now = time.time()
+        waits = [
+            values.get(self.expiry_key(key), now + settings.LOGIN_FAILURE_WINDOW) - now
+            for key, limit in keys.items() if values.get(key, 0) >= limit
+        ]
+        if waits:
+            return max(1, math.ceil(max(waits)))
+        return None
+
+    def failure(self, email, ident):
+        keys = [self.email_key(email)]
+        if ident:
+            keys.append(self.ident_key(ident))
+        for key in keys:
+            # The window starts with the first failure, incr keeps the original expiry
+            if self.cache.add(key, 1, timeout=settings.LOGIN_FAILURE_WINDOW):
+                self.start_window(key)
+                continue
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                if self.cache.add(key, 1, timeout=settings.LOGIN_FAILURE_WINDOW):
+                    self.start_window(key)
+
+    def start_window(self, key):
+        # Caches do not expose the remaining timeout of a key, keep the end of the window next to the counter
+        self.cache.set(self.expiry_key(key), time.time() + settings.LOGIN_FAILURE_WINDOW, timeout=settings.LOGIN_FAILURE_WINDOW)
+
+    def success(self, email):
+        key = self.email_key(email)
+        self.cache.delete_many([key, self.expiry_key(key)])
+
+
+login_failure_throttle = LoginFailureThrottle()
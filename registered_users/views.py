@@ -1,6 +1,5 @@
-import os
-
 from rest_framework import permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -9,8 +8,8 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 
 from project import settings
 from registered_users.models import RegisteredUser
-from registered_users.serializers import RegisteredUserSerializers
-from utils.logger import Logger
+from registered_users.serializers import RegisteredUserSerializers, UserLoginSerializer
+from utils.logger import get_module_logger
 
 
 class UsersRegistrationAPIView(APIView):
@@ -25,16 +24,8 @@ class UsersRegistrationAPIView(APIView):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        # Initialize the logger
-        current_filename = os.path.basename(__file__).split('.')[0]
-        # folder_name = os.path.dirname(os.path.abspath(__file__))
-        folder_name = os.path.dirname(__file__)
-        parent_directory = os.path.basename(folder_name)
-        try:
-            self.logger = Logger(
-                current_filename, settings.LOGGER, False).get_logger(folder_name=parent_directory)
-        except Exception as e:
-            raise Exception(e)
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
 
     def post(self, request, *args, **kwargs):
         """
@@ -49,23 +40,22 @@ class UsersRegistrationAPIView(APIView):
             serializer = self.serializer_class(data=request.data)
             serializer.is_valid(raise_exception=True)
             self.perform_create(serializer)
-
-            # Create token for the user
-            user = RegisteredUser.objects.get(email=serializer.data["email"])
-            user.save()
             self.logger.info('User registered successfully')
             return Response(
                 {
-                    "user_id": user.id,
+                    "user_id": serializer.instance.id,
                     "data": serializer.data,
                     "message": "User Created Successfully",
 
                 },
                 status=status.HTTP_201_CREATED,
             )
+        except ValidationError as e:
+            self.logger.error(e)
+            return Response({"data": e.detail}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             self.logger.error(e)
-            return Response({"data": e}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"data": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def perform_create(self, serializer):
         serializer.save()
@@ -76,20 +66,13 @@ class UserLoginView(TokenObtainPairView):
     User Login API View with no permissions
     """
     permission_classes = [permissions.AllowAny]
+    serializer_class = UserLoginSerializer
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        # Initialize the logger
-        current_filename = os.path.basename(__file__).split('.')[0]
-        # folder_name = os.path.dirname(os.path.abspath(__file__))
-        folder_name = os.path.dirname(__file__)
-        parent_directory = os.path.basename(folder_name)
-        try:
-            self.logger = Logger(
-                current_filename, settings.LOGGER, False).get_logger(folder_name=parent_directory)
-        except Exception as e:
-            raise Exception(e)
+        # Initialize the logger, built once per process and cached
+        self.logger = get_module_logger(__file__, settings.LOGGER)
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
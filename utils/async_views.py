@@ -0,0 +1,104 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from utils.renderers import TimedJSONRenderer
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of DRF's APIView, served natively by Django's async request handling.
+
+    DRF 3.15 has no async views, under ASGI every APIView request runs in a thread and holds it
+    while waiting on the database. This keeps what the API endpoints rely on: the DRF Request
+    (parsers, query_params), authentication through the authenticators' aauthenticate() when they
+    provide one, permissions, DRF's exception handler and JSON rendering. Handlers are coroutines.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    renderer_class = TimedJSONRenderer
+
+    successful_authenticator = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Same as APIView, authentication is token based so CSRF does not apply
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def get_authenticators(self):
+        return [authenticator() for authenticator in self.authentication_classes]
+
+    def get_permissions(self):
+        return [permission() for permission in self.permission_classes]
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, parsers=[parser() for parser in self.parser_classes])
+        self.request = request
+        try:
+            await self.initial(request)
+            method = request.method.lower()
+            handler = getattr(self, method, None) if method in self.http_method_names else None
+            if handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(request, exc)
+        return self.finalize_response(request, response)
+
+    async def initial(self, request):
+        request.user, request.auth = await self.authenticate(request)
+        for permission in self.get_permissions():
+            if not permission.has_permission(request, self):
+                if self.successful_authenticator is None:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    async def authenticate(self, request):
+        for authenticator in self.get_authenticators():
+            if hasattr(authenticator, 'aauthenticate'):
+                user_auth = await authenticator.aauthenticate(request)
+            else:
+                user_auth = await sync_to_async(authenticator.authenticate)(request)
+            if user_auth is not None:
+                self.successful_authenticator = authenticator
+                return user_auth
+        user = api_settings.UNAUTHENTICATED_USER() if api_settings.UNAUTHENTICATED_USER else None
+        return user, None
+
+    def handle_exception(self, request, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticators = self.get_authenticators()
+            auth_header = authenticators[0].authenticate_header(request) if authenticators else None
+            if auth_header:
+                exc.auth_header = auth_header
+            else:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+
+        context = {'view': self, 'args': self.args, 'kwargs': self.kwargs, 'request': request}
+        response = api_settings.EXCEPTION_HANDLER(exc, context)
+        if response is None:
+            raise exc
+        response.exception = True
+        return response
+
+    def finalize_response(self, request, response):
+        """
+        Render DRF Responses into a plain HttpResponse, Django would otherwise render them
+        (they are SimpleTemplateResponses) through a sync_to_async thread hop
+        """
+        if not isinstance(response, Response):
+            return response
+        renderer = self.renderer_class()
+        renderer_context = {'view': self, 'request': request, 'response': response}
+        content = renderer.render(response.data, renderer.media_type, renderer_context)
+        rendered = HttpResponse(content, status=response.status_code, content_type=renderer.media_type)
+        for header, value in response.headers.items():
+            if header.lower() != 'content-type':
+                rendered.headers[header] = value
+        return rendered
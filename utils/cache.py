@@ -0,0 +1,81 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from utils.db_router import current_read_database
+
+
+class ResponseCache:
+    """
+    Per user cache of GET list responses, keyed on path + normalized query params.
+
+    Every key embeds the current generation counter of each model the response is built from.
+    Writes bump the generation (in the views and through model signals), so entries of older
+    generations are never read again and age out of the backend's bounded LRU
+    (RESPONSE_CACHE_MAX_ENTRIES). Counters live in the same cache backend, use a shared backend
+    (file, redis, ...) for invalidation to reach every worker process.
+    """
+
+    def __init__(self, alias="responses"):
+        self.alias = alias
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self):
+        return settings.RESPONSE_CACHE_ENABLED
+
+    @staticmethod
+    def generation_key(model):
+        return f"generation:{model._meta.label_lower}"
+
+    def generations(self, models):
+        keys = [self.generation_key(model) for model in models]
+        generations = self.cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                # Start from the clock rather than 0, an evicted counter must never come back to a value already used
+                self.cache.add(key, time.time_ns(), timeout=None)
+                generations[key] = self.cache.get(key)
+        return [generations[key] for key in keys]
+
+    def bump(self, *models):
+        for model in models:
+            key = self.generation_key(model)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.add(key, time.time_ns(), timeout=None)
+
+    def make_key(self, request, models):
+        query = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+        user = getattr(request.user, "pk", None)
+        # Replica responses may lag behind the primary, they never answer a client pinned to the primary
+        raw = repr((user, current_read_database(), request.get_host(), request.path, query, self.generations(models)))
+        return f"response:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def get(self, key):
+        data = self.cache.get(key)
+        with self.lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
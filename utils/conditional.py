@@ -0,0 +1,151 @@
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from utils.cache import response_cache
+
+
+def _etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def resource_validators(instance):
+    """
+    Strong ETag and Last-Modified timestamp of a single object, derived from its updated_date
+    """
+    updated_date = instance.updated_date
+    return _etag(instance._meta.label_lower, instance.pk, updated_date.isoformat()), int(updated_date.timestamp())
+
+
+def list_aggregates(queryset):
+    """
+    count + max(updated_date) of the filtered rows in one aggregate query. Inserts and updates
+    move max(updated_date), deletes change the count.
+    """
+    return queryset.order_by().aggregate(count=Count('id'), last_modified=Max('updated_date'))
+
+
+async def alist_aggregates(queryset):
+    return await queryset.order_by().aaggregate(count=Count('id'), last_modified=Max('updated_date'))
+
+
+def list_validators(request, aggregates):
+    """
+    ETag and Last-Modified timestamp of a list page from its list_aggregates()
+    """
+    last_modified = aggregates['last_modified']
+    etag = _etag(request.path, _query(request), aggregates['count'], last_modified.isoformat() if last_modified else None)
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def generation_validators(request, models):
+    """
+    ETag of a list page from the response cache generation counters of its models, no query.
+    Every write, deletes included, bumps a generation (see utils.cache.ResponseCache).
+    """
+    return _etag(request.path, _query(request), response_cache.generations(models)), None
+
+
+def _query(request):
+    return sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def conditional_list_response(*models):
+    """
+    Conditional GET and response caching for list views.
+
+    The view must implement get_list_queryset(request) returning the filtered queryset. Cached
+    entries carry their validators, so a revalidation of a cached page is answered without any
+    query. Otherwise If-None-Match/If-Modified-Since are checked and answered with 304 before the
+    page is fetched and serialized. Works for sync and async get().
+
+    With the response cache enabled (shared generation counters) the validators come from the
+    generations. Otherwise they come from list_aggregates(), except for keyset (?cursor=) pages which
+    are never counted and go without validators. The aggregated count is left on request.list_count
+    for the paginator (utils.pagination.CustomPagination), the rows are counted once per request.
+    """
+
+    def keyset_page(view, request):
+        return getattr(view.pagination_class, 'cursor_query_param', None) in request.query_params
+
+    def cached(request):
+        key = response_cache.make_key(request, models) if response_cache.enabled else None
+        entry = response_cache.get(key) if key else None
+        if entry is None:
+            return key, None
+        data, etag, last_modified = entry
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        return key, not_modified or set_validators(Response(data), etag, last_modified)
+
+    def finalize(key, response, etag, last_modified):
+        if isinstance(response, Response) and response.status_code == 200:
+            set_validators(response, etag, last_modified)
+            if key:
+                response_cache.set(key, (response.data, etag, last_modified))
+        return response
+
+    def decorator(view_method):
+        if iscoroutinefunction(view_method):
+            @wraps(view_method)
+            async def async_wrapper(view, request, *args, **kwargs):
+                key, response = cached(request)
+                if response is not None:
+                    return response
+                if response_cache.enabled:
+                    etag, last_modified = generation_validators(request, models)
+                elif keyset_page(view, request):
+                    # Counting every matching row would cost more than the keyset page itself
+                    return await view_method(view, request, *args, **kwargs)
+                else:
+                    try:
+                        aggregates = await alist_aggregates(view.get_list_queryset(request))
+                    except ValidationError:
+                        # Invalid filters, let the view build the error response
+                        return await view_method(view, request, *args, **kwargs)
+                    # The paginator reuses the count instead of running its own COUNT
+                    request.list_count = aggregates['count']
+                    etag, last_modified = list_validators(request, aggregates)
+                not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if not_modified is not None:
+                    return not_modified
+                return finalize(key, await view_method(view, request, *args, **kwargs), etag, last_modified)
+            return async_wrapper
+
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            key, response = cached(request)
+            if response is not None:
+                return response
+            if response_cache.enabled:
+                etag, last_modified = generation_validators(request, models)
+            elif keyset_page(view, request):
+                # Counting every matching row would cost more than the keyset page itself
+                return view_method(view, request, *args, **kwargs)
+            else:
+                try:
+                    aggregates = list_aggregates(view.get_list_queryset(request))
+                except ValidationError:
+                    # Invalid filters, let the view build the error response
+                    return view_method(view, request, *args, **kwargs)
+                # The paginator reuses the count instead of running its own COUNT
+                request.list_count = aggregates['count']
+                etag, last_modified = list_validators(request, aggregates)
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+            return finalize(key, view_method(view, request, *args, **kwargs), etag, last_modified)
+        return wrapper
+    return decorator
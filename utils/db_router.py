@@ -0,0 +1,75 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_read_database = ContextVar("read_database", default=None)
+
+
+class _ReadDatabase:
+    """
+    Replica picked for a read_from_replica() block, dropped for the primary on the first routed
+    read when the block's stay_on_primary() check says so
+    """
+
+    def __init__(self, alias, stay_on_primary=None):
+        self.alias = alias
+        self.stay_on_primary = stay_on_primary
+
+    def resolve(self):
+        stay_on_primary, self.stay_on_primary = self.stay_on_primary, None
+        if stay_on_primary is not None and stay_on_primary():
+            self.alias = None
+        return self.alias
+
+
+@contextmanager
+def read_from_replica(stay_on_primary=None):
+    """
+    Route the reads made inside the block to one replica, picked once for the whole block.
+
+    stay_on_primary() is called once, on the first routed read, that is after the view
+    authenticated the request. The reads of the block go to the primary when it returns True.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    token = _read_database.set(_ReadDatabase(random.choice(replicas), stay_on_primary) if replicas else None)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+def current_read_database():
+    """
+    Alias the reads of the current request go to
+    """
+    read_database = _read_database.get()
+    return (read_database.resolve() if read_database is not None else None) or "default"
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary (default). Reads go to a replica inside read_from_replica(),
+    which ReplicaRoutingMiddleware opens for GET/HEAD requests, and to the primary otherwise.
+
+    Users are always read from the primary: a freshly registered user would not be found on a
+    lagging replica, and authentication mostly hits the user cache anyway.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label == settings.AUTH_USER_MODEL:
+            return "default"
+        return current_read_database()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
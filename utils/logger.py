@@ -1,10 +1,11 @@
 import logging
 import logging.handlers
-import multiprocessing
 import os
+import queue
 import sys
 import threading
-from datetime import datetime
+import weakref
+from datetime import datetime, time, timedelta
 
 from dotenv import load_dotenv
 
@@ -21,6 +22,13 @@ log_level = {
 }
 
 
+def dated_log_path(home_path, now):
+    """
+    Directory holding the log files of the given day: <home_path>/logs/<year>/<month>/<day>
+    """
+    return os.path.join(home_path, "logs", str(now.year), now.strftime("%B"), str(now.day))
+
+
 class Logger:
     __default_log_level = "DEBUG"
     __default_log_format = "%(levelname)s [%(asctime)s] %(process)d/%(thread)d %(folder_name)s %(filename)s %(funcName)s : %(message)s"
@@ -33,6 +41,9 @@ class Logger:
     __filename = None
     __config = None
     __log_to_console = False
+    __async = False
+    __queue_size = 10000
+    __batch_size = 500
 
     __home_path = os.getenv("HOME_PATH", ".")
 
@@ -45,13 +56,11 @@ class Logger:
             self.__log_level = self.__config.get("log_level", self.__default_log_level)
             self.__format = self.__config.get("format", self.__default_log_format)
             self.__date_format = self.__config.get("date_format", self.__default_log_date_format)
+            self.__async = self.__config.get("async", False)
+            self.__queue_size = self.__config.get("queue_size", self.__queue_size)
+            self.__batch_size = self.__config.get("batch_size", self.__batch_size)
 
     def get_logger(self, is_multiprocess=False, folder_name=None):
-        # current_date = datetime.now().strftime("%Y-%m-%d")
-        now = datetime.now()
-        month_name = now.strftime("%B")
-        log_path = os.path.join(self.__home_path, "logs", str(now.year), month_name, str(now.day))
-        # log_path = os.path.join(self.__home_path, "logs", current_date)
         logging.basicConfig(level=log_level.get(self.__log_level))
 
         if self.__log_to_console:
@@ -71,15 +80,13 @@ class Logger:
                     logger.addHandler(log_handler)
         else:
             logger = logging.getLogger(self.__filename)
-            stream_handler_list = [h for h in logger.handlers if isinstance(h, logging.FileHandler)]
+            stream_handler_list = [h for h in logger.handlers if isinstance(h, (logging.FileHandler, MultiProcessingLogHandler))]
             if not len(stream_handler_list):
-                if not os.path.exists(log_path):
-                    os.makedirs(log_path)
-                if is_multiprocess:
-                    log_handler = MultiProcessingLogHandler(filename=os.path.join(log_path, f"{self.__filename}.log"), when="midnight")
+                if is_multiprocess or self.__async:
+                    log_handler = MultiProcessingLogHandler(self.__home_path, self.__filename,
+                                                            queue_size=self.__queue_size, batch_size=self.__batch_size)
                 else:
-                    log_handler = logging.handlers.TimedRotatingFileHandler(filename=os.path.join(log_path, f'{self.__filename}.log'),
-                                                                            when="midnight")
+                    log_handler = DatedFileHandler(self.__home_path, self.__filename)
                 log_handler.setFormatter(logging.Formatter(self.__format, datefmt=self.__date_format))
                 logger.propagate = 0
                 logger.addHandler(log_handler)
@@ -87,51 +94,205 @@ class Logger:
         return logger
 
 
-class MultiProcessingLogHandler(logging.Handler):
-    def __init__(self, filename, when="midnight"):
-        logging.Handler.__init__(self)
-        self._handler = logging.handlers.TimedRotatingFileHandler(filename=filename, when=when)
-        self.queue = multiprocessing.Queue(-1)
-        threading.Thread(target=self.receive)
+_logger_cache = {}
+_logger_cache_lock = threading.Lock()
+_module_logger_cache = {}
 
-    def setFormatter(self, fmt):
-        logging.Handler.setFormatter(self, fmt)
-        self._handler.setFormatter(fmt)
 
-    def receive(self):
-        """this function checks the queue and sends logging output to stream(file like object in this case)
-        """
-        while True:
-            try:
-                record = self.queue.get()
-                self._handler.emit(record)
-            except (KeyboardInterrupt, SystemExit):
-                raise
-            except Exception:
-                break
-
-    def send(self, s):
-        self.queue.put_nowait(s)
-
-    def _format_record(self, record):
-        """format message before writing in file."""
-        if record.args:
-            record.msg = record.msg % record.args
-            record.args = None
-        if record.exc_info:
-            self.format(record)
-            record.exc_info = None
-        return record
+def _freeze_config(config):
+    return tuple(sorted(config.items())) if config else None
+
+
+def get_cached_logger(filename, config=None, folder_name=None, log_to_console=False, is_multiprocess=False):
+    """
+    Process wide memoized version of Logger(...).get_logger(...).
+
+    Views are instantiated on every request, building the Logger there re-ran basicConfig, the dated path
+    computation and the handler scan each time. Adapters are built once per (filename, folder_name, config)
+    and handed out from a dict afterward, the dated directory is rolled over by DatedFileHandler itself.
+    """
+    key = (filename, folder_name, _freeze_config(config), log_to_console, is_multiprocess)
+    logger = _logger_cache.get(key)
+    if logger is not None:
+        return logger
+    with _logger_cache_lock:
+        logger = _logger_cache.get(key)
+        if logger is None:
+            logger = Logger(filename, config, log_to_console).get_logger(is_multiprocess=is_multiprocess, folder_name=folder_name)
+            _logger_cache[key] = logger
+    return logger
+
+
+def get_module_logger(module_file, config=None, log_to_console=False):
+    """
+    Cached logger named after a module file, e.g. get_module_logger(__file__, settings.LOGGER)
+    logs to <filename>.log with the parent directory as folder_name.
+    """
+    key = (module_file, _freeze_config(config), log_to_console)
+    logger = _module_logger_cache.get(key)
+    if logger is None:
+        current_filename = os.path.basename(module_file).split('.')[0]
+        parent_directory = os.path.basename(os.path.dirname(module_file))
+        logger = get_cached_logger(current_filename, config, folder_name=parent_directory, log_to_console=log_to_console)
+        _module_logger_cache[key] = logger
+    return logger
+
+
+class DatedFileHandler(logging.FileHandler):
+    """
+    File handler writing to <home_path>/logs/<year>/<month>/<day>/<filename>.log.
+    The target directory is switched to the next day's one by the first record emitted after midnight.
+
+    With flush_each_record=False records are only written to the stream buffer, the owner is expected
+    to call flush() itself, which lets the queue listener write a whole batch with a single flush.
+    """
+
+    def __init__(self, home_path, filename, encoding=None, flush_each_record=True):
+        self.home_path = home_path
+        self.flush_each_record = flush_each_record
+        self.log_filename = f"{filename}.log"
+        now = datetime.now()
+        logging.FileHandler.__init__(self, self._prepare_path(now), encoding=encoding)
+        self.rollover_at = self._next_midnight(now)
+
+    def _prepare_path(self, now):
+        log_path = dated_log_path(self.home_path, now)
+        os.makedirs(log_path, exist_ok=True)
+        return os.path.join(log_path, self.log_filename)
+
+    @staticmethod
+    def _next_midnight(now):
+        return datetime.combine(now.date() + timedelta(days=1), time.min).timestamp()
+
+    def do_rollover(self, created):
+        now = datetime.fromtimestamp(created)
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.baseFilename = os.path.abspath(self._prepare_path(now))
+        self.rollover_at = self._next_midnight(now)
 
     def emit(self, record):
+        # emit runs under the handler lock, so the rollover is thread safe
+        if record.created >= self.rollover_at:
+            self.do_rollover(record.created)
+        if self.flush_each_record:
+            logging.FileHandler.emit(self, record)
+            return
         try:
-            s = self._format_record(record)
-            self.send(s)
-        except (KeyboardInterrupt, SystemExit):
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except RecursionError:
             raise
         except Exception:
             self.handleError(record)
 
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener draining up to batch_size records per wakeup and flushing its handlers once per batch.
+    """
+
+    def __init__(self, queue, *handlers, batch_size=500):
+        super().__init__(queue, *handlers)
+        self.batch_size = batch_size
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                pass
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+                q.task_done()
+            for handler in self.handlers:
+                handler.flush()
+            if stop:
+                return
+
+    def enqueue_sentinel(self):
+        # The queue is bounded, wait for room instead of failing with queue.Full
+        self.queue.put(self._sentinel)
+
+
+_async_handlers = weakref.WeakSet()
+
+
+class MultiProcessingLogHandler(logging.handlers.QueueHandler):
+    """
+    Non blocking file handler. emit() only puts the record on a bounded in-memory queue, a background
+    BatchingQueueListener writes them in batches to the dated log file so file I/O stays off the request thread.
+
+    Every gunicorn worker runs its own listener and appends to the same dated files. When the queue is full
+    the record is dropped and counted in `dropped` rather than blocking the request. close() (called by
+    logging.shutdown at interpreter exit) drains the queue before closing the file.
+    """
+
+    def __init__(self, home_path, filename, queue_size=10000, batch_size=500):
+        logging.handlers.QueueHandler.__init__(self, queue.Queue(maxsize=queue_size))
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._handler = DatedFileHandler(home_path, filename, flush_each_record=False)
+        self.listener = None
+        self.start()
+        _async_handlers.add(self)
+
+    def start(self):
+        self.listener = BatchingQueueListener(self.queue, self._handler, batch_size=self.batch_size)
+        self.listener.start()
+
+    def after_fork(self):
+        # The listener thread does not survive fork (e.g. gunicorn --preload), give the child its own
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.start()
+
+    def setFormatter(self, fmt):
+        # Only the file handler formats, prepare() keeps just the message so it is not formatted twice
+        self._handler.setFormatter(fmt)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def stats(self):
+        return {"depth": self.queue.qsize(), "capacity": self.queue_size, "dropped": self.dropped}
+
     def close(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
         self._handler.close()
-        logging.Handler.close(self)
+        logging.handlers.QueueHandler.close(self)
+
+
+def log_queue_stats():
+    """
+    Aggregated depth, capacity and dropped record count of all asynchronous log handlers of this process.
+    """
+    stats = {"depth": 0, "capacity": 0, "dropped": 0}
+    for handler in list(_async_handlers):
+        for key, value in handler.stats().items():
+            stats[key] += value
+    return stats
+
+
+def _restart_async_handlers():
+    for handler in list(_async_handlers):
+        handler.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_async_handlers)
@@ -0,0 +1,523 @@
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from project import settings
+from utils.mmap_dict import MmapedDict, read_file
+from utils.slow_queries import log_slow_query
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _key(family, sample, labels):
+    return json.dumps([family, sample, labels], separators=(",", ":"))
+
+
+class MultiprocessStore:
+    """
+    Values of this process written through to <METRICS_MULTIPROC_DIR>/<pid>-<start>.db (a MmapedDict),
+    so the process answering /metrics can add up the values of every worker. The file is created
+    on first write and again after a fork, each process only ever writes its own file. The start
+    time keeps a process reusing the pid of a dead worker from overwriting that worker's totals.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.file = None
+
+    @property
+    def directory(self):
+        return os.environ.get("METRICS_MULTIPROC_DIR")
+
+    def write(self, key, value):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.file = MmapedDict(os.path.join(self.directory, f"{self.pid}-{time.time_ns()}.db"))
+            self.file.write(key, value)
+
+    def read_all(self):
+        """
+        [(pid, alive, {key: value})] of every process that wrote metrics
+        """
+        results = []
+        for path in glob.glob(os.path.join(self.directory, "*.db")):
+            pid = int(os.path.basename(path).split("-", 1)[0])
+            results.append((pid, _alive(pid), read_file(path)))
+        return results
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+multiprocess_store = MultiprocessStore()
+
+
+class Metric:
+    """
+    A metric family, one child per label values. Children keep their values in process and,
+    with METRICS_MULTIPROC_DIR set, write every change through to the process's metrics file.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.get(values)
+                if child is None:
+                    child = self.children[values] = self.new_child(dict(zip(self.labelnames, map(str, values))))
+        return child
+
+    def new_child(self, labels):
+        raise NotImplementedError
+
+    def samples(self):
+        for child in list(self.children.values()):
+            yield from child.samples()
+
+
+class CounterChild:
+
+    def __init__(self, metric, labels):
+        self.lock = threading.Lock()
+        self.value = 0.0
+        self.key = _key(metric.name, metric.name + "_total", labels) if multiprocess_store.directory else None
+        self.labels = labels
+        self.name = metric.name + "_total"
+        if self.key is not None:
+            multiprocess_store.write(self.key, 0.0)
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+            value = self.value
+        if self.key is not None:
+            multiprocess_store.write(self.key, value)
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def new_child(self, labels):
+        return CounterChild(self, labels)
+
+
+class HistogramChild:
+    """
+    Fixed bucket histogram, observations only cost a bisect and an increment under a lock.
+    Percentiles are interpolated inside the bucket holding the rank, their error is bounded
+    by the bucket widths.
+    """
+
+    def __init__(self, metric, labels):
+        self.name = metric.name
+        self.labels = labels
+        self.buckets = metric.buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+        self.keys = None
+        if multiprocess_store.directory:
+            bounds = [*map(_format_bound, self.buckets), "+Inf"]
+            self.keys = (
+                [_key(self.name, self.name + "_bucket", {**labels, "le": bound}) for bound in bounds],
+                _key(self.name, self.name + "_sum", labels),
+                _key(self.name, self.name + "_count", labels),
+            )
+            # Every bucket is exposed, not only the ones observed so far
+            for key in [*self.keys[0], *self.keys[1:]]:
+                multiprocess_store.write(key, 0.0)
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            bucket_count, count, total = self.counts[index], self.count, self.sum
+        if self.keys is not None:
+            bucket_keys, sum_key, count_key = self.keys
+            multiprocess_store.write(bucket_keys[index], bucket_count)
+            multiprocess_store.write(sum_key, total)
+            multiprocess_store.write(count_key, count)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.count, self.sum
+
+    def samples(self):
+        # Per bucket counts, the exposition makes them cumulative
+        counts, count, total = self.snapshot()
+        for bound, bucket_count in zip([*map(_format_bound, self.buckets), "+Inf"], counts):
+            yield self.name + "_bucket", {**self.labels, "le": bound}, bucket_count
+        yield self.name + "_sum", self.labels, total
+        yield self.name + "_count", self.labels, count
+
+    def percentile(self, q, snapshot=None):
+        counts, count, _total = snapshot or self.snapshot()
+        return bucket_percentile(self.buckets, counts, count, q)
+
+    def summary(self):
+        snapshot = self.snapshot()
+        counts, count, total = snapshot
+        return {
+            "count": count,
+            "mean": total / count if count else None,
+            "p50": self.percentile(50, snapshot),
+            "p95": self.percentile(95, snapshot),
+            "p99": self.percentile(99, snapshot),
+        }
+
+
+def bucket_percentile(buckets, counts, count, q):
+    if not count:
+        return None
+    rank = q / 100 * count
+    seen = 0
+    for index, bucket_count in enumerate(counts):
+        if bucket_count and seen + bucket_count >= rank:
+            lower = buckets[index - 1] if index else 0.0
+            # Observations above the last bound are reported as the last bound
+            upper = buckets[index] if index < len(buckets) else buckets[-1]
+            return lower + (upper - lower) * (rank - seen) / bucket_count
+        seen += bucket_count
+    return buckets[-1]
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def new_child(self, labels):
+        return HistogramChild(self, labels)
+
+
+class Registry:
+    """
+    Metrics of the process and collectors, functions returning [(name, type, documentation,
+    [(sample name, labels, value)])] for values owned elsewhere (cache and pool statistics, log
+    queue depth) read when metrics are collected.
+
+    In multiprocess mode (METRICS_MULTIPROC_DIR) collect() adds up the files of every process:
+    counters and histograms of exited workers keep counting, gauges only come from live ones.
+    Collector values of other processes are as fresh as their last refresh_collectors() call,
+    PerformanceMiddleware makes it at most once per COLLECT_INTERVAL seconds.
+    """
+    COLLECT_INTERVAL = 1.0
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.collected_at = 0.0
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def collect_families(self):
+        families = {metric.name: (metric.name, metric.type, metric.documentation, list(metric.samples())) for metric in self.metrics.values()}
+        for collector in self.collectors:
+            for name, family_type, documentation, samples in collector():
+                # Several collectors may report samples of one family (cache_hits of each cache)
+                families.setdefault(name, (name, family_type, documentation, []))[3].extend(samples)
+        return list(families.values())
+
+    def refresh_collectors(self, force=False):
+        """
+        Write the collector values of this process to its metrics file, in multiprocess mode
+        """
+        now = time.monotonic()
+        if not multiprocess_store.directory or (not force and now - self.collected_at < self.COLLECT_INTERVAL):
+            return
+        self.collected_at = now
+        for collector in self.collectors:
+            for name, _type, _documentation, samples in collector():
+                for sample, labels, value in samples:
+                    multiprocess_store.write(_key(name, sample, labels), value)
+
+    def collect(self):
+        """
+        [(name, type, documentation, [(sample name, labels, value)])] of this process, or of all
+        processes in multiprocess mode
+        """
+        families = self.collect_families()
+        if not multiprocess_store.directory:
+            return families
+        self.refresh_collectors(force=True)
+        types = {name: family_type for name, family_type, _documentation, _samples in families}
+        totals = {}
+        for _pid, alive, values in multiprocess_store.read_all():
+            for key, value in values.items():
+                name, sample, labels = json.loads(key)
+                if types.get(name) == "gauge" and not alive:
+                    continue
+                sample_key = (name, sample, tuple(labels.items()))
+                totals[sample_key] = totals.get(sample_key, 0.0) + value
+        merged = []
+        for name, family_type, documentation, _samples in families:
+            samples = [(sample, dict(labels), value) for (family, sample, labels), value in totals.items() if family == name]
+            merged.append((name, family_type, documentation, sorted(samples, key=_sample_order)))
+        return merged
+
+    def exposition(self):
+        """
+        Prometheus text format (0.0.4) of collect()
+        """
+        lines = []
+        for name, family_type, documentation, samples in self.collect():
+            lines.append(f"# HELP {name} {_escape_help(documentation)}")
+            lines.append(f"# TYPE {name} {family_type}")
+            cumulative = {}
+            for sample, labels, value in samples:
+                if family_type == "histogram" and sample.endswith("_bucket"):
+                    # Buckets are stored per bucket, exposed cumulative
+                    series = tuple(sorted((label, label_value) for label, label_value in labels.items() if label != "le"))
+                    value = cumulative[series] = cumulative.get(series, 0.0) + value
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_SUFFIX_ORDER = {"_bucket": 0, "_sum": 1, "_count": 2}
+
+
+def _sample_order(sample):
+    # Series by series, histogram buckets by bound and then _sum and _count
+    name, labels, _value = sample
+    bound = labels.get("le")
+    return (
+        tuple((label, value) for label, value in labels.items() if label != "le"),
+        next((order for suffix, order in _SUFFIX_ORDER.items() if name.endswith(suffix)), 0),
+        float(bound) if bound is not None else 0.0,
+    )
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{label}="{_escape_label(value)}"' for label, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    if value == int(value) and abs(value) < 1e15:
+        return f"{int(value)}"
+    return repr(float(value))
+
+
+registry = Registry()
+
+http_requests = registry.counter("http_requests", "Requests served, by URL name, method and status", ["route", "method", "status"])
+http_request_duration = registry.histogram("http_request_duration_seconds", "Request wall time, by URL name", ["route"])
+db_queries = registry.counter("db_queries", "Database queries run while serving requests, by URL name", ["route"])
+db_query_seconds = registry.counter("db_query_seconds", "Time spent in database queries while serving requests, by URL name", ["route"])
+
+
+def log_queue_collector():
+    from utils.logger import log_queue_stats
+
+    stats = log_queue_stats()
+    return [
+        ("log_queue_depth", "gauge", "Records waiting in the asynchronous log queues", [("log_queue_depth", {}, stats["depth"])]),
+        ("log_queue_capacity", "gauge", "Capacity of the asynchronous log queues", [("log_queue_capacity", {}, stats["capacity"])]),
+        ("log_records_dropped", "counter", "Log records dropped on a full queue",
+         [("log_records_dropped_total", {}, stats["dropped"])]),
+    ]
+
+
+def cache_collector(cache_name, stats):
+    """
+    Families of the hit and miss counts of a cache, for collectors of caches with a stats() method
+    """
+    return [
+        ("cache_hits", "counter", "Cache lookups answered from the cache", [("cache_hits_total", {"cache": cache_name}, stats["hits"])]),
+        ("cache_misses", "counter", "Cache lookups that missed", [("cache_misses_total", {"cache": cache_name}, stats["misses"])]),
+    ]
+
+
+def response_cache_collector():
+    from utils.cache import response_cache
+
+    return cache_collector("responses", response_cache.stats())
+
+
+def pool_collector():
+    # Only processes running the pooled backend have pools, do not import it otherwise
+    base = sys.modules.get("utils.pooled_postgresql.base")
+    if base is None:
+        return []
+    gauges = {
+        "size": "Open connections", "in_use": "Connections checked out", "idle": "Idle connections",
+        "waiting": "Threads waiting for a connection",
+    }
+    counters = {"checkouts": "Connection checkouts", "timeouts": "Checkouts that timed out", "wait_time": "Seconds spent waiting for a connection"}
+    stats = base.pool_stats()
+    families = [
+        (f"db_pool_{name}", "gauge", documentation, [(f"db_pool_{name}", {"database": alias}, values[name]) for alias, values in stats.items()])
+        for name, documentation in gauges.items()
+    ]
+    families += [
+        (f"db_pool_{name}", "counter", documentation,
+         [(f"db_pool_{name}_total", {"database": alias}, values[name]) for alias, values in stats.items()])
+        for name, documentation in counters.items()
+    ]
+    return families
+
+
+registry.register_collector(log_queue_collector)
+registry.register_collector(response_cache_collector)
+registry.register_collector(pool_collector)
+
+
+def observe_request(route, method, status, seconds, stats=None):
+    http_requests.labels(route, method, status).inc()
+    http_request_duration.labels(route).observe(seconds)
+    if stats is not None:
+        db_queries.labels(route).inc(stats.queries)
+        db_query_seconds.labels(route).inc(stats.db_time)
+
+
+def latency_summary():
+    """
+    {route: {count, mean, p50, p95, p99}} of the requests served by this process, in seconds
+    """
+    return {
+        values[0]: child.summary()
+        for values, child in sorted(http_request_duration.children.items())
+    }
+
+
+def _forget_multiprocess_file():
+    # A forked child writes its own file, opened on its first write
+    multiprocess_store.pid = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_multiprocess_file)
+
+
+class RequestStats:
+    """
+    Timings collected while one request is served, see utils.middleware.PerformanceMiddleware
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = {}
+        self.slow_query_seconds = settings.SLOW_QUERY_MS / 1000
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.db_time += elapsed
+            self.queries += 1
+            if elapsed >= self.slow_query_seconds and self.request is not None:
+                log_slow_query(self.request, context["connection"], sql, params, many, elapsed)
+
+
+_request_stats = ContextVar("request_stats", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper timing the queries run for the current request, installed on every
+    connection by install_query_recorder. Connections are per thread, this also catches the
+    queries async views run in sync_to_async threads as the request context follows them.
+    """
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.execute_wrapper(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """
+    connection_created receiver, also run on already open connections
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def collect_request_stats(request=None):
+    stats = RequestStats(request)
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+@contextmanager
+def timing(name):
+    """
+    Add the time spent in the block to the current request's timing called name, if any
+    """
+    stats = _request_stats.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(name, time.perf_counter() - start)
@@ -0,0 +1,140 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from utils.db_router import read_from_replica
+from utils.logger import get_module_logger
+from utils.metrics import collect_request_stats, install_query_recorder, observe_request, registry
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serves the reads of GET/HEAD requests from a replica.
+
+    A user that made a successful write (POST/PUT/PATCH/DELETE) is pinned to the primary for
+    REPLICA_STICKY_SECONDS so it reads its own writes while the replicas catch up. Users are told
+    apart by their primary key, known once the view authenticated the request, and the pins are
+    kept in the REPLICA_STICKY_CACHE cache (use a shared backend when running several worker processes).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.reads_from_replica(request):
+            response = self.get_response(request)
+            self.process_response(request, response)
+            return response
+        with read_from_replica(lambda: self.is_sticky(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not self.reads_from_replica(request):
+            response = await self.get_response(request)
+            self.process_response(request, response)
+            return response
+        with read_from_replica(lambda: self.is_sticky(request)):
+            return await self.get_response(request)
+
+    @property
+    def cache(self):
+        return caches[settings.REPLICA_STICKY_CACHE]
+
+    @staticmethod
+    def sticky_key(request):
+        # DRF sets the authenticated user on the underlying request too
+        user_id = getattr(getattr(request, "user", None), "pk", None)
+        if user_id is None:
+            return None
+        return f"replica-sticky:{user_id}"
+
+    @staticmethod
+    def reads_from_replica(request):
+        return bool(settings.DATABASE_REPLICAS) and request.method in ("GET", "HEAD")
+
+    def is_sticky(self, request):
+        key = self.sticky_key(request)
+        return key is not None and self.cache.get(key) is not None
+
+    def process_response(self, request, response):
+        if request.method in ("GET", "HEAD", "OPTIONS") or response.status_code >= 400:
+            return
+        key = self.sticky_key(request)
+        if key is not None:
+            self.cache.set(key, True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+class PerformanceMiddleware:
+    """
+    Measures every request: wall time, number and total time of the database queries (an
+    execute wrapper added to every connection as it is opened), the serialize/render timings
+    recorded with utils.metrics.timing() and the response size. Queries slower than SLOW_QUERY_MS
+    go to the slow query log (utils.slow_queries).
+
+    The measurements are logged as one key=value line, sent as a Server-Timing header when
+    SERVER_TIMING is on, and they feed the per route request, latency and query metrics of
+    utils.metrics served on /metrics. Put it first in MIDDLEWARE so the whole stack and the final size are measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.logger = get_module_logger(__file__, settings.LOGGER)
+        connection_created.connect(install_query_recorder, dispatch_uid="install_query_recorder")
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection=connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with collect_request_stats(request) as stats:
+            response = self.get_response(request)
+        self.process_response(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with collect_request_stats(request) as stats:
+            response = await self.get_response(request)
+        self.process_response(request, response, stats, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def route(request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "unmatched"
+        return match.view_name or match._func_path
+
+    def process_response(self, request, response, stats, elapsed):
+        route = self.route(request)
+        observe_request(route, request.method, response.status_code, elapsed, stats)
+        registry.refresh_collectors()
+        size = None if response.streaming else len(response.content)
+
+        if settings.SERVER_TIMING:
+            metrics = [f"total;dur={elapsed * 1000:.2f}",
+                       f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"']
+            metrics += [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stats.timings.items()]
+            response["Server-Timing"] = ", ".join(metrics)
+
+        timings = "".join(f" {name}_ms={seconds * 1000:.2f}" for name, seconds in stats.timings.items())
+        self.logger.info(
+            f"request method={request.method} route={route} status={response.status_code} "
+            f"duration_ms={elapsed * 1000:.2f} db_queries={stats.queries} db_ms={stats.db_time * 1000:.2f}"
+            f"{timings} bytes={size if size is not None else 'streamed'}"
+        )
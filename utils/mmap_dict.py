@@ -0,0 +1,99 @@
+import mmap
+import os
+import struct
+
+_INITIAL_SIZE = 1 << 16
+# Header: bytes used, padded to 8
+_HEADER = struct.Struct("i4x")
+_KEY_LENGTH = struct.Struct("i")
+_VALUE = struct.Struct("d")
+
+
+def _key_space(length):
+    """
+    Bytes taken by a key of length bytes, padded so the value after it is 8 byte aligned
+    """
+    return length + (-(_KEY_LENGTH.size + length) % 8)
+
+
+class MmapedDict:
+    """
+    Append only map of str -> float kept in a memory mapped file, one file per process.
+
+    Entries are laid out as <key length><key, padded><float64> with 8 byte aligned values. A key
+    is appended once and its value overwritten in place afterward, readers in other processes
+    (read_file) never see a partial entry as the used size in the header only moves past an entry
+    once it is fully written.
+    Not thread safe, callers hold their own lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.positions = {}
+        fd = os.open(path, os.O_RDWR | os.O_CREAT)
+        try:
+            self.capacity = max(os.fstat(fd).st_size, _INITIAL_SIZE)
+            os.ftruncate(fd, self.capacity)
+            self.map = mmap.mmap(fd, self.capacity)
+        finally:
+            os.close(fd)
+        self.used = _HEADER.unpack_from(self.map, 0)[0] or _HEADER.size
+        for key, _value, position in _entries(self.map, self.used):
+            self.positions[key] = position
+
+    def write(self, key, value):
+        position = self.positions.get(key)
+        if position is None:
+            position = self._append(key)
+        _VALUE.pack_into(self.map, position, value)
+
+    def _append(self, key):
+        encoded = key.encode()
+        size = _KEY_LENGTH.size + _key_space(len(encoded)) + _VALUE.size
+        while self.used + size > self.capacity:
+            self._grow()
+        start = self.used
+        _KEY_LENGTH.pack_into(self.map, start, len(encoded))
+        self.map[start + _KEY_LENGTH.size:start + _KEY_LENGTH.size + len(encoded)] = encoded
+        position = start + size - _VALUE.size
+        _VALUE.pack_into(self.map, position, 0.0)
+        self.used += size
+        _HEADER.pack_into(self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def _grow(self):
+        self.capacity *= 2
+        self.map.close()
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            os.ftruncate(fd, self.capacity)
+            self.map = mmap.mmap(fd, self.capacity)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.map.close()
+
+
+def _entries(data, used):
+    position = _HEADER.size
+    while position < used:
+        length = _KEY_LENGTH.unpack_from(data, position)[0]
+        key_start = position + _KEY_LENGTH.size
+        key = bytes(data[key_start:key_start + length]).decode()
+        value_position = key_start + _key_space(length)
+        yield key, _VALUE.unpack_from(data, value_position)[0], value_position
+        position = value_position + _VALUE.size
+
+
+def read_file(path):
+    """
+    {key: value} of a file written by a MmapedDict, possibly owned by another process
+    """
+    with open(path, "rb") as fp:
+        data = fp.read()
+    if len(data) < _HEADER.size:
+        return {}
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    return {key: value for key, value, _position in _entries(data, used)}
@@ -1,7 +1,14 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import datetime
 from urllib import parse
 
+from django.core.paginator import InvalidPage
+from django.db.models import Q
 from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
 
 
 def replace_query_param(url, key, val):
@@ -25,11 +32,148 @@ def remove_query_param(url, key):
 
 
 class CustomPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset (cursor) mode.
+
+    Sending ``?cursor=`` (empty for the first page) switches to keyset pagination:
+    rows are seeked on ``(created_date, id)`` descending instead of COUNT + OFFSET,
+    so every page costs the same single index range scan however deep the client is.
+    Ranked searches (``?q=``) are ordered by relevance and cannot be seeked, they are
+    rejected in cursor mode.
+    """
     page_size = 10
     page_size_query_param = 'per_page'
     max_page_size = 10
 
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-created_date', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+    # Query params ordering the rows by something else than cursor_ordering
+    ranked_query_params = ('q',)
+
+    cursor_mode = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if self.cursor_mode:
+            queryset = self.get_cursor_queryset(queryset, request)
+            if queryset is None:
+                return None
+            return self.get_cursor_page(list(queryset))
+
+        paginator = self.get_django_paginator(queryset, request)
+        if paginator is None:
+            return None
+        self.page = self.get_page(paginator, request)
+        return list(self.page)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, rows are read with the async ORM
+        """
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if self.cursor_mode:
+            queryset = self.get_cursor_queryset(queryset, request)
+            if queryset is None:
+                return None
+            return self.get_cursor_page([row async for row in queryset])
+
+        paginator = self.get_django_paginator(queryset, request)
+        if paginator is None:
+            return None
+        if 'count' not in vars(paginator):
+            # Paginator.count is a cached_property, fill it with the async COUNT before the page is validated
+            paginator.count = await queryset.acount()
+        self.page = self.get_page(paginator, request)
+        self.page.object_list = [row async for row in self.page.object_list]
+        return self.page.object_list
+
+    def get_django_paginator(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Rows already counted for the list validators (utils.conditional), skip the paginator COUNT
+        count = getattr(request, 'list_count', None)
+        if count is not None:
+            paginator.count = count
+        return paginator
+
+    def get_page(self, paginator, request):
+        page_number = self.get_page_number(request, paginator)
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return page
+
+    def get_cursor_queryset(self, queryset, request):
+        """
+        Sliced queryset of the requested keyset page, plus one row to know whether another page exists
+        """
+        ranked = [name for name in self.ranked_query_params if request.query_params.get(name)]
+        if ranked:
+            raise ValidationError({self.cursor_query_param: f'Cannot be combined with {", ".join(ranked)}, use page numbers'})
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+        self.cursor_position = position
+        self.cursor_reverse = reverse
+
+        if reverse:
+            queryset = queryset.order_by('created_date', 'id')
+        else:
+            queryset = queryset.order_by(*self.cursor_ordering)
+
+        if position is not None:
+            created_date, pk = position
+            if reverse:
+                queryset = queryset.filter(Q(created_date__gt=created_date) | Q(created_date=created_date, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_date__lt=created_date) | Q(created_date=created_date, id__lt=pk))
+
+        # Fetch one extra row to know whether another page exists, no COUNT needed
+        return queryset[:self.page_size + 1]
+
+    def get_cursor_page(self, results):
+        position, reverse = self.cursor_position, self.cursor_reverse
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next_cursor = position is not None
+            self.has_previous_cursor = has_more
+        else:
+            self.has_next_cursor = has_more
+            self.has_previous_cursor = position is not None
+
+        self.first_position = self.get_position(results[0]) if results else position
+        self.last_position = self.get_position(results[-1]) if results else position
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
     def get_next_link(self):
+        if self.cursor_mode:
+            if not self.has_next_cursor or self.last_position is None:
+                return None
+            return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.last_position))
         if not self.page.has_next():
             return None
         url = self.request.build_absolute_uri()
@@ -37,6 +181,10 @@ class CustomPagination(PageNumberPagination):
         return replace_query_param(url, self.page_query_param, page_number)
 
     def get_previous_link(self):
+        if self.cursor_mode:
+            if not self.has_previous_cursor or self.first_position is None:
+                return None
+            return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.first_position, reverse=True))
         if not self.page.has_previous():
             return None
         url = self.request.build_absolute_uri()
@@ -44,3 +192,37 @@ class CustomPagination(PageNumberPagination):
         if page_number == 1:
             return remove_query_param(url, self.page_query_param)
         return replace_query_param(url, self.page_query_param, page_number)
+
+    @staticmethod
+    def get_position(item):
+        if isinstance(item, dict):
+            return item['created_date'], item['id']
+        return item.created_date, item.id
+
+    def encode_cursor(self, position, reverse=False):
+        """
+        Encode a (created_date, id) position into an opaque cursor string
+        """
+        created_date, pk = position
+        tokens = {'p': f"{created_date.isoformat()}|{pk}"}
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens)
+        return b64encode(querystring.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        """
+        Decode the cursor query param into a ((created_date, id), reverse) pair
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            created_date, pk = tokens['p'][0].rsplit('|', 1)
+            position = (datetime.fromisoformat(created_date), int(pk))
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
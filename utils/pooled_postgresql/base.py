@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+
+from django.db.backends.postgresql import base
+
+from project import settings
+from utils.logger import get_module_logger
+from utils.pooled_postgresql.pool import ConnectionPool, PoolTimeout
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """
+    Process wide pool of the database alias, built from settings_dict['POOL'] on first use
+    """
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                options = settings_dict.get("POOL", {})
+                pool = _pools[alias] = ConnectionPool(
+                    connect=None,
+                    max_size=options.get("MAX_SIZE", 10),
+                    timeout=options.get("TIMEOUT", 30),
+                    max_lifetime=options.get("MAX_LIFETIME", 3600),
+                    max_idle=options.get("MAX_IDLE", 600),
+                    check_idle=options.get("CHECK_IDLE", 5),
+                )
+                pool.stats_interval = options.get("STATS_INTERVAL", 60)
+                pool.stats_logged = time.monotonic()
+    return pool
+
+
+def pool_stats():
+    """
+    Stats of every connection pool of this process, keyed by database alias
+    """
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend checking connections out of a process wide ConnectionPool.
+
+    Django closes the connection at the end of each request (keep CONN_MAX_AGE at 0), close()
+    hands it back to the pool instead of closing the socket, except inside an atomic block where
+    it is discarded. Pool usage is logged every
+    POOL['STATS_INTERVAL'] seconds and on every checkout timeout.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        try:
+            connection = pool.getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        except PoolTimeout as e:
+            get_module_logger(__file__, settings.LOGGER).error(f"Database Pool {self.alias} Exhausted {pool.stats()}")
+            raise self.Database.OperationalError(str(e)) from e
+        if time.monotonic() - pool.stats_logged > pool.stats_interval:
+            pool.stats_logged = time.monotonic()
+            get_module_logger(__file__, settings.LOGGER).info(f"Database Pool {self.alias} {pool.stats()}")
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # close() inside atomic() keeps self.connection until the block exits, another
+                # thread must never check it out meanwhile: close it as the stock backend does
+                self.pool.discard(self.connection)
+            else:
+                self.pool.putconn(self.connection)
+
+
+if hasattr(os, "register_at_fork"):
+    # Pooled sockets belong to the parent, a forked worker starts with empty pools
+    os.register_at_fork(after_in_child=_pools.clear)
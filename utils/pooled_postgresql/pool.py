@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Waiter:
+    """
+    A caller blocked in getconn(), served first come first served. It receives either an idle
+    connection entry or, when a connection was retired, the free slot to open a new one.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of DB-API connections shared by every thread of the process.
+
+    Connections are handed out most recently used first, opened on demand up to max_size and
+    retired once older than max_lifetime or idle for longer than max_idle. A connection idle for
+    more than check_idle seconds is pinged before it is handed out again. When the pool is
+    exhausted callers queue in arrival order and give up with PoolTimeout after timeout seconds.
+    """
+
+    def __init__(self, connect=None, max_size=10, timeout=30, max_lifetime=3600, max_idle=600, check_idle=5):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_idle = check_idle
+
+        self.lock = threading.Lock()
+        self.idle = deque()  # (connection, created, returned)
+        self.waiters = deque()
+        self.created = {}  # id(connection) -> creation time, of connections checked out
+        self.size = 0
+
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+
+    def getconn(self, connect=None):
+        """
+        Check a connection out, connect() (or the pool's connect) opens a new one when needed
+        """
+        start = time.monotonic()
+        waited = False
+        while True:
+            with self.lock:
+                entry = self._take_idle()
+                if entry is None and self.size < self.max_size:
+                    # Reserve the slot, the connection is opened outside the lock
+                    self.size += 1
+                    entry = (None, None, None)
+                elif entry is None:
+                    waiter = _Waiter()
+                    self.waiters.append(waiter)
+            if entry is None:
+                waited = True
+                entry = self._wait(waiter, start)
+
+            connection, created, returned = entry
+            if connection is None:
+                try:
+                    connection = (connect or self.connect)()
+                except Exception:
+                    self._release_slot()
+                    raise
+                created = time.monotonic()
+            elif time.monotonic() - returned > self.check_idle and not self._ping(connection):
+                self._discard(connection)
+                continue
+            self._checked_out(connection, created, time.monotonic() - start if waited else 0.0, opened=returned is None)
+            return connection
+
+    def putconn(self, connection):
+        """
+        Return a connection, rolled back to a clean state, or retire it when it is broken or too old
+        """
+        with self.lock:
+            created = self.created.pop(id(connection), None)
+        if created is None:
+            # Not checked out from this pool
+            self._close_quietly(connection)
+            return
+        now = time.monotonic()
+        if connection.closed or now - created > self.max_lifetime or not self._reset(connection):
+            self._discard(connection)
+            return
+        with self.lock:
+            if self.waiters:
+                self._hand_over(self.waiters.popleft(), (connection, created, now))
+            else:
+                self.idle.append((connection, created, now))
+
+    def discard(self, connection):
+        """
+        Close a checked out connection that must not be handed out again, its slot is freed
+        """
+        with self.lock:
+            created = self.created.pop(id(connection), None)
+        if created is None:
+            self._close_quietly(connection)
+        else:
+            self._discard(connection)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = list(self.idle), deque()
+        for connection, _created, _returned in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "max_size": self.max_size,
+                "in_use": self.size - len(self.idle),
+                "idle": len(self.idle),
+                "waiting": len(self.waiters),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+                "timeouts": self.timeouts,
+                "opened": self.opened,
+                "closed": self.closed,
+            }
+
+    def _wait(self, waiter, start):
+        remaining = start + self.timeout - time.monotonic()
+        if waiter.event.wait(max(remaining, 0)):
+            return waiter.entry
+        with self.lock:
+            if waiter.event.is_set():
+                # Served between the timeout and taking the lock
+                return waiter.entry
+            self.waiters.remove(waiter)
+            self.timeouts += 1
+        raise PoolTimeout(f"No database connection available within {self.timeout}s (max_size={self.max_size})")
+
+    @staticmethod
+    def _hand_over(waiter, entry):
+        waiter.entry = entry
+        waiter.event.set()
+
+    def _take_idle(self):
+        now = time.monotonic()
+        while self.idle:
+            connection, created, returned = self.idle.pop()
+            if now - created > self.max_lifetime or now - returned > self.max_idle:
+                self.size -= 1
+                self.closed += 1
+                self._close_quietly(connection)
+                continue
+            return connection, created, returned
+        return None
+
+    def _checked_out(self, connection, created, wait_time, opened):
+        with self.lock:
+            self.created[id(connection)] = created
+            self.checkouts += 1
+            self.opened += opened
+            if wait_time:
+                self.waits += 1
+                self.wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def _discard(self, connection):
+        self._close_quietly(connection)
+        with self.lock:
+            self.closed += 1
+        self._release_slot()
+
+    def _release_slot(self):
+        with self.lock:
+            if self.waiters:
+                # The slot goes to the oldest waiter, which opens a new connection
+                self._hand_over(self.waiters.popleft(), (None, None, None))
+            else:
+                self.size -= 1
+
+    @staticmethod
+    def _reset(connection):
+        try:
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _ping(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
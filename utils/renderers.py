@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+from utils.metrics import timing
+
+
+class TimedJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer reporting its time as the "render" timing of the request
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing("render"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+def ndjson_lines(rows, batch_size=100):
+    """
+    Encode an iterable of dicts as newline delimited JSON, yielding a string per batch_size rows
+    """
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(row, cls=encoders.JSONEncoder, ensure_ascii=False))
+        if len(buffer) >= batch_size:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+def csv_lines(rows, fields, batch_size=100):
+    """
+    Encode an iterable of dicts as CSV with a header row, nested values are written as JSON
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    count = 0
+    for row in rows:
+        writer.writerow([
+            json.dumps(row.get(field), cls=encoders.JSONEncoder) if isinstance(row.get(field), (dict, list)) else row.get(field)
+            for field in fields
+        ])
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """
+    Newline delimited JSON, selected with ?format=ndjson
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        return "".join(ndjson_lines(rows)).encode(self.charset)
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    Comma separated values with a header row, selected with ?format=csv
+    """
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        fields = list(rows[0]) if rows else []
+        return "".join(csv_lines(rows, fields)).encode(self.charset)
@@ -0,0 +1,122 @@
+import datetime
+
+from django.utils.functional import cached_property
+from rest_framework import ISO_8601, relations, serializers
+from rest_framework.settings import api_settings
+
+from utils.metrics import timing
+
+
+def _identity(value):
+    return value
+
+
+class ValuesSerializer:
+    """
+    Read only fast path for a ModelSerializer.
+
+    Rows are read with queryset.values() and turned into dicts with one precomputed converter per
+    field, skipping model instantiation and DRF's per field get_attribute/to_representation dispatch.
+    The output is the same as serializer_class(instance).data for the plain model fields the
+    serializers of this project use.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def fields(self):
+        """
+        (output name, values() key, converter) per readable field, built on first use
+        """
+        model = self.serializer_class.Meta.model
+        fields = []
+        for field in self.serializer_class().fields.values():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ValueError(f'{field.field_name} is not a plain model field, it cannot be read with values()')
+            model_field = model._meta.get_field(field.source)
+            fields.append((field.field_name, model_field.attname, self.get_converter(field)))
+        return fields
+
+    @cached_property
+    def value_names(self):
+        return [key for _name, key, _converter in self.fields]
+
+    @staticmethod
+    def get_converter(field):
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+            # values() already holds the raw foreign key
+            return _identity
+        if isinstance(field, serializers.JSONField) and not field.binary:
+            return _identity
+        if isinstance(field, serializers.CharField):
+            return _identity
+        if isinstance(field, serializers.IntegerField):
+            return int
+        if type(field) is serializers.DateField:
+            output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+            if output_format and output_format.lower() == ISO_8601:
+                return datetime.date.isoformat
+        if type(field) is serializers.DateTimeField:
+            return DateTimeConverter(field)
+        return field.to_representation
+
+    def values(self, queryset):
+        return queryset.values(*self.value_names)
+
+    def bind(self):
+        """
+        Converters with the active timezone resolved, valid for the duration of one request
+        """
+        return [
+            (name, key, converter.bind() if isinstance(converter, DateTimeConverter) else converter)
+            for name, key, converter in self.fields
+        ]
+
+    def to_representation(self, row, fields=None):
+        return {
+            name: None if row[key] is None else converter(row[key])
+            for name, key, converter in (fields or self.bind())
+        }
+
+    def serialize(self, rows):
+        fields = self.bind()
+        if not isinstance(rows, list):
+            # Run the query before the serialize timing starts
+            rows = list(rows)
+        with timing("serialize"):
+            return [
+                {name: None if row[key] is None else converter(row[key]) for name, key, converter in fields}
+                for row in rows
+            ]
+
+
+class DateTimeConverter:
+    """
+    DateTimeField.to_representation without the per value timezone lookup,
+    the timezone is looked up once in bind()
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        field = self.field
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if not output_format or output_format.lower() != ISO_8601:
+            return field.to_representation
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if isinstance(value, str) or value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+    def __call__(self, value):
+        return self.field.to_representation(value)
@@ -0,0 +1,126 @@
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+from django.db import connections, transaction
+
+from project import settings
+from utils.logger import get_cached_logger, get_module_logger
+
+# Distinct statements remembered for the EXPLAIN interval, the memory is reset past this size
+_EXPLAINED_STATEMENTS_LIMIT = 10000
+# Quoted literals of an EXPLAIN plan, the plan conditions show the parameter values
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+def _slow_query_logger():
+    # <HOME_PATH>/logs/<year>/<month>/<day>/slow_queries.log, next to the other log files
+    return get_cached_logger("slow_queries", settings.LOGGER, folder_name="db")
+
+
+def origin_view(request):
+    """
+    Dotted path of the view serving request, None before URL resolution
+    """
+    match = getattr(request, "resolver_match", None)
+    return match._func_path if match is not None else None
+
+
+def _params(params):
+    return f" params={params!r}" if settings.SLOW_QUERY_LOG_PARAMS else ""
+
+
+def _plan(plan):
+    return plan if settings.SLOW_QUERY_LOG_PARAMS else _STRING_LITERAL.sub("'?'", plan)
+
+
+def log_slow_query(request, connection, sql, params, many, seconds):
+    """
+    Log a query of a request slower than SLOW_QUERY_MS if it was issued by a view of SLOW_QUERY_VIEW_MODULES,
+    and sample its EXPLAIN (ANALYZE, BUFFERS) plan on PostgreSQL. Parameters only with SLOW_QUERY_LOG_PARAMS
+    """
+    view = origin_view(request)
+    if view is None or not view.startswith(tuple(settings.SLOW_QUERY_VIEW_MODULES)):
+        return
+    _slow_query_logger().warning(
+        f"slow query view={view} method={request.method} path={request.path} database={connection.alias} "
+        f"duration_ms={seconds * 1000:.2f} sql={sql}{_params(params)}"
+    )
+    if connection.vendor == "postgresql" and not many:
+        explain_sampler.submit(connection.alias, sql, params, view, seconds)
+
+
+class ExplainSampler:
+    """
+    Runs EXPLAIN (ANALYZE, BUFFERS) of a sample of the slow queries on a background thread and logs the plans.
+
+    Only SELECT statements are explained, ANALYZE runs the statement again. The run is a READ ONLY
+    transaction with a SET LOCAL statement_timeout that is always rolled back, so nothing it does stays
+    on a (pooled) connection afterwards. Each distinct statement is explained at most once per
+    SLOW_QUERY_EXPLAIN_INTERVAL seconds, and queries arriving while the bounded queue is full are skipped.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.queue = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.explained_at = {}
+        self.logger = get_module_logger(__file__, settings.LOGGER)
+
+    def submit(self, alias, sql, params, view, seconds):
+        if random.random() >= settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+            return
+        if not sql.lstrip().upper().startswith("SELECT"):
+            return
+        now = time.monotonic()
+        with self.lock:
+            explained_at = self.explained_at.get(sql)
+            if explained_at is not None and now - explained_at < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+                return
+            if len(self.explained_at) >= _EXPLAINED_STATEMENTS_LIMIT:
+                self.explained_at.clear()
+            self.explained_at[sql] = now
+            if self.pid != os.getpid():
+                # First use, or the thread of the parent did not survive a fork
+                self.pid = os.getpid()
+                self.queue = queue.Queue(maxsize=self.queue_size)
+                threading.Thread(target=self.run, args=(self.queue,), name="explain-sampler", daemon=True).start()
+        try:
+            self.queue.put_nowait((alias, sql, params, view, seconds))
+        except queue.Full:
+            pass
+
+    def run(self, jobs):
+        while True:
+            alias, sql, params, view, seconds = jobs.get()
+            try:
+                plan = self.explain(alias, sql, params)
+            except Exception as e:
+                self.logger.warning(f"EXPLAIN of a slow query of {view} failed: {e}")
+                continue
+            _slow_query_logger().warning(
+                f"slow query plan view={view} database={alias} duration_ms={seconds * 1000:.2f} sql={sql}{_params(params)}\n{_plan(plan)}"
+            )
+
+    @staticmethod
+    def explain(alias, sql, params):
+        connection = connections[alias]
+        try:
+            with transaction.atomic(using=alias):
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION READ ONLY")
+                    cursor.execute("SET LOCAL statement_timeout = %s", [settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS])
+                    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+                    plan = "\n".join(row[0] for row in cursor.fetchall())
+                transaction.set_rollback(True, using=alias)
+        finally:
+            # Give the connection back (to the pool) between samples
+            connection.close()
+        return plan
+
+
+explain_sampler = ExplainSampler()
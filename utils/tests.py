@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from utils.pooled_postgresql import base
+from utils.pooled_postgresql.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """
+    Stand-in for a psycopg2 connection, records the calls the pool makes
+    """
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = True
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def test_checkout_reuses_returned_connection(self):
+        pool = ConnectionPool(connect=FakeConnection, max_size=2)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)
+        stats = pool.stats()
+        self.assertEqual((stats["opened"], stats["checkouts"], stats["in_use"]), (1, 2, 1))
+
+    def test_return_rolls_back_open_transaction(self):
+        pool = ConnectionPool(connect=FakeConnection)
+        connection = pool.getconn()
+        connection.autocommit = False
+        pool.putconn(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_return_discards_broken_connection(self):
+        pool = ConnectionPool(connect=FakeConnection)
+        connection = pool.getconn()
+        connection.closed = 1
+        pool.putconn(connection)
+        stats = pool.stats()
+        self.assertEqual((stats["size"], stats["idle"], stats["closed"]), (0, 0, 1))
+
+    def test_exhausted_pool_times_out(self):
+        pool = ConnectionPool(connect=FakeConnection, max_size=1, timeout=0.05)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_waiter_receives_returned_connection(self):
+        pool = ConnectionPool(connect=FakeConnection, max_size=1, timeout=5)
+        connection = pool.getconn()
+
+        def give_back():
+            time.sleep(0.05)
+            pool.putconn(connection)
+
+        thread = threading.Thread(target=give_back)
+        thread.start()
+        self.assertIs(pool.getconn(), connection)
+        thread.join()
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_discard_frees_the_slot(self):
+        pool = ConnectionPool(connect=FakeConnection, max_size=1)
+        connection = pool.getconn()
+        pool.discard(connection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.getconn(), connection)
+
+
+class PooledDatabaseWrapperTests(SimpleTestCase):
+    alias = "pool_tests"
+
+    def setUp(self):
+        pool = base._pools[self.alias] = ConnectionPool(connect=FakeConnection)
+        pool.stats_interval = 60
+        pool.stats_logged = time.monotonic()
+        self.addCleanup(base._pools.pop, self.alias, None)
+        self.pool = pool
+        self.wrapper = base.DatabaseWrapper({"POOL": {}}, alias=self.alias)
+        self.connection = self.wrapper.connection = pool.getconn()
+
+    def test_close_returns_connection_to_pool(self):
+        self.wrapper.close()
+        self.assertIsNone(self.wrapper.connection)
+        self.assertFalse(self.connection.closed)
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+    def test_close_in_atomic_block_discards_connection(self):
+        self.wrapper.in_atomic_block = True
+        self.wrapper.close()
+        # Django keeps the connection until the atomic block exits, it must not be handed out meanwhile
+        self.assertIs(self.wrapper.connection, self.connection)
+        self.assertTrue(self.wrapper.closed_in_transaction)
+        self.assertTrue(self.connection.closed)
+        stats = self.pool.stats()
+        self.assertEqual((stats["size"], stats["idle"]), (0, 0))
@@ -0,0 +1,31 @@
+import hmac
+import ipaddress
+
+from django.http import HttpResponse
+
+from project import settings
+from utils.metrics import registry
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _allowed_address(address):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, a plain Django view so scrapes skip authentication and throttling of the API.
+    Scrapes send METRICS_TOKEN as a bearer token, without a token only METRICS_ALLOWED_NETWORKS are served.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+            return HttpResponse("Invalid metrics token\n", status=401, content_type="text/plain")
+    elif not _allowed_address(request.META.get("REMOTE_ADDR", "")):
+        return HttpResponse("Metrics are not served to this address\n", status=403, content_type="text/plain")
+    return HttpResponse(registry.exposition(), content_type=PROMETHEUS_CONTENT_TYPE)